@@ -0,0 +1,236 @@
+"""
+    Fast-startup artifact bundle for the linear models.
+
+    Description: Starting the app normally means importing scikit-learn and
+    unpickling four joblib files. The exporter below writes the fitted
+    TF-IDF vocabulary, stop words and idf weights plus the Logistic
+    Regression and Naive Bayes parameters into a directory of plain NumPy
+    arrays and JSON. The loader memory-maps those arrays and reproduces the
+    vectorizer and both models' predictions with NumPy alone, without
+    importing scikit-learn, SciPy or joblib.
+
+    Usage:
+
+        python artifact_bundle.py export bundle/
+        python artifact_bundle.py check bundle/ test.csv
+
+"""
+import json
+import os
+import re
+import sys
+from collections import Counter
+
+import numpy as np
+
+from label_schema import LabelSchema
+from linear_scoring import LinearScorer
+
+FORMAT_VERSION = 1
+CONFIG_FILE = "bundle.json"
+
+# Models that reduce to a sparse-dense product plus a normalization
+BUNDLED_MODELS = ("Logistic Regression", "Naive Bayes")
+
+
+def _slug(name):
+    return re.sub(r"\W+", "_", name.strip().lower())
+
+
+class CSRRows:
+    """Minimal CSR matrix: enough to multiply TF-IDF rows by dense weights."""
+
+    def __init__(self, indptr, indices, data, n_features):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.shape = (len(indptr) - 1, n_features)
+
+    def __matmul__(self, weights):
+        """Return the dense product with an ``(n_features, k)`` array."""
+        out = np.zeros((self.shape[0], weights.shape[1]))
+        if len(self.data):
+            contributions = self.data[:, None] * weights[self.indices]
+            rows = np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+            np.add.at(out, rows, contributions)
+        return out
+
+
+class BundleVectorizer:
+    """Re-implementation of the fitted word-unigram TfidfVectorizer."""
+
+    def __init__(self, config, idf):
+        self.lowercase = config["lowercase"]
+        self.token_pattern = re.compile(config["token_pattern"])
+        self.stop_words = frozenset(config["stop_words"])
+        self.vocabulary = {term: i for i, term in enumerate(config["vocabulary"])}
+        self.norm = config["norm"]
+        self.sublinear_tf = config["sublinear_tf"]
+        self.idf = idf
+
+    def transform(self, texts):
+        """Return the TF-IDF rows of ``texts`` as a CSRRows matrix."""
+        indptr, indices, data = [0], [], []
+        for text in texts:
+            if self.lowercase:
+                text = text.lower()
+            counts = Counter(
+                self.vocabulary[token] for token in self.token_pattern.findall(text)
+                if token not in self.stop_words and token in self.vocabulary)
+            indices.extend(sorted(counts))
+            data.extend(counts[i] for i in sorted(counts))
+            indptr.append(len(indices))
+
+        indptr = np.asarray(indptr, dtype=np.int64)
+        indices = np.asarray(indices, dtype=np.int64)
+        data = np.asarray(data, dtype=np.float64)
+        if self.sublinear_tf:
+            data = np.log(data) + 1.0
+        if self.idf is not None:
+            data *= self.idf[indices]
+        if self.norm:
+            rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+            if self.norm == "l2":
+                norms = np.sqrt(np.bincount(rows, data * data, minlength=len(indptr) - 1))
+            else:
+                norms = np.bincount(rows, np.abs(data), minlength=len(indptr) - 1)
+            norms[norms == 0] = 1.0
+            data /= norms[rows]
+        return CSRRows(indptr, indices, data, len(self.vocabulary))
+
+
+class BundleModel(LinearScorer):
+    """A LinearScorer built from exported parameters, with its label schema."""
+
+    def __init__(self, config, weights, bias):
+        super().__init__(config["kind"], weights, bias, config["classes"],
+                         config.get("multi_class", "multinomial"))
+        self.schema = LabelSchema(config["classes"], config["labels"])
+
+
+class Bundle:
+    """A loaded bundle: the vectorizer and every exported model."""
+
+    def __init__(self, path, mmap=True):
+        with open(os.path.join(path, CONFIG_FILE), encoding="utf-8") as f:
+            config = json.load(f)
+        if config["format_version"] != FORMAT_VERSION:
+            raise ValueError("Unsupported bundle format: {}".format(config["format_version"]))
+        mode = "r" if mmap else None
+
+        def array(name):
+            return np.load(os.path.join(path, name), mmap_mode=mode)
+
+        vectorizer = config["vectorizer"]
+        idf = array(vectorizer["idf"]) if vectorizer.get("idf") else None
+        self.vectorizer = BundleVectorizer(vectorizer, idf)
+        self.models = {
+            name: BundleModel(model, array(model["weights"]), array(model["bias"]))
+            for name, model in config["models"].items()
+        }
+        self.sources = config.get("sources", {})
+
+    def classify(self, texts, model_name):
+        """Return the predicted category name for each of ``texts``."""
+        model = self.models[model_name]
+        return model.schema.decode(model.predict(self.vectorizer.transform(texts))).tolist()
+
+
+def export_bundle(path, registry=None, model_names=BUNDLED_MODELS):
+    """Write the vectorizer and the named linear models as a bundle."""
+    from model_registry import get_registry
+
+    registry = registry or get_registry()
+    vectorizer = registry.get_vectorizer()
+    if vectorizer.analyzer != "word" or tuple(vectorizer.ngram_range) != (1, 1):
+        raise ValueError("Only word unigram vectorizers can be bundled")
+    if vectorizer.preprocessor or vectorizer.tokenizer or vectorizer.strip_accents:
+        raise ValueError("Custom preprocessing cannot be bundled")
+
+    os.makedirs(path, exist_ok=True)
+    terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    config = {
+        "format_version": FORMAT_VERSION,
+        "vectorizer": {
+            "lowercase": vectorizer.lowercase,
+            "token_pattern": vectorizer.token_pattern,
+            "stop_words": sorted(vectorizer.get_stop_words() or ()),
+            "vocabulary": terms,
+            "norm": vectorizer.norm,
+            "sublinear_tf": vectorizer.sublinear_tf,
+            "idf": "idf.npy" if vectorizer.use_idf else None,
+        },
+        "models": {},
+        "sources": {registry.vectorizer_path: registry.stats()["artifacts"]
+                    [registry.vectorizer_path]["sha256"]},
+    }
+    if vectorizer.use_idf:
+        np.save(os.path.join(path, "idf.npy"), np.asarray(vectorizer.idf_, dtype=np.float64))
+
+    for name in model_names:
+        model = registry.get_model(name)
+        schema = registry.get_labels(name)
+        try:
+            scorer = LinearScorer.from_estimator(model)
+        except TypeError:
+            raise ValueError("{} is not a bundleable linear model".format(name)) from None
+        entry = {"kind": scorer.kind}
+        if scorer.kind == "logistic":
+            entry["multi_class"] = scorer.multi_class
+
+        slug = _slug(name)
+        # Stored feature-major so scoring gathers contiguous rows
+        np.save(os.path.join(path, slug + ".weights.npy"), scorer.weights)
+        np.save(os.path.join(path, slug + ".bias.npy"), scorer.bias)
+        entry.update({
+            "weights": slug + ".weights.npy",
+            "bias": slug + ".bias.npy",
+            "classes": schema.classes.tolist(),
+            "labels": schema.labels.tolist(),
+        })
+        config["models"][name] = entry
+        config["sources"][registry.model_paths[name]] = registry.model_hash(name)
+
+    with open(os.path.join(path, CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=1)
+    return config
+
+
+def check_bundle(path, data, text_column="content"):
+    """Compare bundle predictions with the pickled models on a CSV file."""
+    import pandas as pd
+
+    from inference import vectorize
+    from model_registry import get_registry
+
+    registry = get_registry()
+    bundle = Bundle(path)
+    texts = pd.read_csv(data)[text_column].fillna("").astype(str).tolist()
+    reference = vectorize(registry.get_vectorizer(), texts)
+    X = bundle.vectorizer.transform(texts)
+    ok = True
+    for name, model in bundle.models.items():
+        estimator = registry.get_model(name)
+        # Compare with scikit-learn itself, not inference.predict, which
+        # shares the LinearScorer code with the bundle
+        same_labels = (model.predict(X) == estimator.predict(reference)).mean()
+        max_error = np.abs(model.predict_proba(X) - estimator.predict_proba(reference)).max()
+        print("{:<22} label agreement {:.4%}  max |proba diff| {:.2e}".format(name, same_labels, max_error))
+        ok = ok and same_labels == 1.0 and max_error < 1e-9
+    return ok
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) >= 2 and argv[0] == "export":
+        config = export_bundle(argv[1])
+        print("Wrote {} with {}".format(argv[1], ", ".join(config["models"])))
+        return 0
+    if len(argv) >= 3 and argv[0] == "check":
+        return 0 if check_bundle(argv[1], argv[2]) else 1
+    print("Usage: python artifact_bundle.py export DIR | check DIR DATA.csv", file=sys.stderr)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""
+    Asyncio inference service with admission control and deadlines.
+
+    Description: Every caller (each Streamlit session, for example) shares
+    one InferenceService. CPU-bound work runs on a fixed-size thread pool,
+    and the service limits how much of it can be outstanding:
+
+        max_in_flight  requests running on the pool at once
+        max_queue      requests allowed to wait for a free slot; beyond
+                       that new requests are rejected straight away with
+                       Overloaded (HTTP 429 semantics)
+        timeout        per-request deadline covering both the wait for a
+                       slot and the work itself; BudgetExceeded is raised
+                       when it passes
+
+    A request that times out stops being awaited, but its slot is only
+    released when the work actually finishes, so the pool is never asked
+    to run more than ``max_in_flight`` requests. Chunked vectorization of
+    long texts also checks the deadline and gives up early (see
+    input_guard.py).
+
+    ``drain`` stops admitting requests, waits for the outstanding ones
+    and shuts the pool down. ServiceClient runs the service on a
+    background event loop so that synchronous code such as the Streamlit
+    app can call it; it is drained when the process exits.
+
+    Configuration (environment variables):
+
+        CLASSIFIER_SERVICE_WORKERS    pool threads (default 4)
+        CLASSIFIER_MAX_IN_FLIGHT      concurrent requests (default 4)
+        CLASSIFIER_MAX_QUEUE          waiting requests (default 16)
+        CLASSIFIER_REQUEST_TIMEOUT    default deadline in seconds (default 10)
+
+"""
+import asyncio
+import atexit
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from input_guard import BudgetExceeded, InputPolicy, check_input, run_ensemble, run_guarded
+from model_versions import routed_classify
+
+
+class ServiceUnavailable(RuntimeError):
+    """Raised when the service does not accept a request."""
+
+    status = 503
+
+
+class Overloaded(ServiceUnavailable):
+    """Raised when every slot is busy and the wait queue is full."""
+
+    status = 429
+
+
+class InferenceService:
+    """Bounded, deadline-aware asyncio front end for the classifiers."""
+
+    def __init__(self, workers=4, max_in_flight=4, max_queue=16, timeout=10.0):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._in_flight = 0
+        self._waiting = 0
+        self._closing = False
+        self._counts = {"accepted": 0, "completed": 0, "failed": 0, "rejected": 0, "timed_out": 0}
+
+    @classmethod
+    def from_env(cls, environ=os.environ):
+        return cls(
+            workers=int(environ.get("CLASSIFIER_SERVICE_WORKERS", 4)),
+            max_in_flight=int(environ.get("CLASSIFIER_MAX_IN_FLIGHT", 4)),
+            max_queue=int(environ.get("CLASSIFIER_MAX_QUEUE", 16)),
+            timeout=float(environ.get("CLASSIFIER_REQUEST_TIMEOUT", 10)),
+        )
+
+    async def run(self, fn, *args, timeout=None):
+        """Run ``fn(*args)`` on the pool, subject to admission and a deadline."""
+        if self._closing:
+            self._counts["rejected"] += 1
+            raise ServiceUnavailable("The inference service is shutting down")
+        if self._in_flight + self._waiting >= self.max_in_flight + self.max_queue:
+            self._counts["rejected"] += 1
+            raise Overloaded("Too many requests in progress, try again shortly")
+
+        timeout = self.timeout if timeout is None else timeout
+        self._counts["accepted"] += 1
+        self._waiting += 1
+        self._idle.clear()
+        try:
+            return await asyncio.wait_for(self._execute(fn, args), timeout or None)
+        except BudgetExceeded:
+            # Gave up on its own deadline inside the pool
+            self._counts["timed_out"] += 1
+            raise
+        except asyncio.TimeoutError:
+            self._counts["timed_out"] += 1
+            raise BudgetExceeded("Request did not finish within {:.1f} s".format(timeout)) from None
+        except Exception:
+            self._counts["failed"] += 1
+            raise
+        finally:
+            self._check_idle()
+
+    async def _execute(self, fn, args):
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        self._in_flight += 1
+        future = asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        future.add_done_callback(self._release)
+        # Shielded: a timeout abandons the result but the slot stays taken
+        # until the thread is actually done
+        result = await asyncio.shield(future)
+        self._counts["completed"] += 1
+        return result
+
+    def _release(self, future):
+        if not future.cancelled():
+            # Mark the outcome as seen; a timed-out caller no longer awaits it
+            future.exception()
+        self._in_flight -= 1
+        self._slots.release()
+        self._check_idle()
+
+    def _check_idle(self):
+        if not self._in_flight and not self._waiting:
+            self._idle.set()
+
+    async def classify(self, texts, model_name, timeout=None):
+        """Classify a list of texts (see ``model_versions.routed_classify``)."""
+        return await self.run(routed_classify, texts, model_name, timeout=timeout)
+
+    async def classify_text(self, text, model_name, policy=None, details=None, timeout=None):
+        """Classify one text under the input guard's policy.
+
+        Returns ``(result, info)`` like ``input_guard.guarded_classify``; the
+        deadline defaults to the policy's time budget.
+        """
+        policy = policy or InputPolicy.from_env()
+        info = check_input(text, policy)
+        timeout = policy.time_budget if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout if timeout else None
+        result, stages = await self.run(run_guarded, text, model_name, policy, deadline,
+                                        None, details, timeout=timeout)
+        info["seconds"] = time.monotonic() - start
+        if stages:
+            info["stages"] = stages
+        return result, info
+
+    async def classify_all_text(self, text, policy=None, timeout=None):
+        """Score one text with every model under the input guard's policy.
+
+        Returns ``(ensemble, info)``, with ``ensemble`` as from
+        ``inference.classify_all`` and ``info`` as from ``classify_text``.
+        """
+        policy = policy or InputPolicy.from_env()
+        info = check_input(text, policy)
+        timeout = policy.time_budget if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout if timeout else None
+        ensemble = await self.run(run_ensemble, text, policy, deadline, timeout=timeout)
+        info["seconds"] = time.monotonic() - start
+        return ensemble, info
+
+    async def drain(self, timeout=30.0):
+        """Stop admitting requests and wait for outstanding ones to finish.
+
+        Returns True if everything finished within ``timeout`` seconds.
+        """
+        self._closing = True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            drained = True
+        except asyncio.TimeoutError:
+            drained = False
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        return drained
+
+    def stats(self):
+        return dict(self._counts, in_flight=self._in_flight, waiting=self._waiting,
+                    max_in_flight=self.max_in_flight, max_queue=self.max_queue,
+                    closing=self._closing)
+
+
+class ServiceClient:
+    """Synchronous client running an InferenceService on its own event loop."""
+
+    def __init__(self, service_factory=InferenceService.from_env):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever,
+                                        name="inference-service", daemon=True)
+        self._thread.start()
+        self.service = self._call(self._create(service_factory))
+
+    @staticmethod
+    async def _create(service_factory):
+        # Built inside the loop so its primitives belong to it
+        return service_factory()
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def run(self, fn, *args, timeout=None):
+        return self._call(self.service.run(fn, *args, timeout=timeout))
+
+    def classify(self, texts, model_name, timeout=None):
+        return self._call(self.service.classify(texts, model_name, timeout))
+
+    def classify_text(self, text, model_name, policy=None, details=None, timeout=None):
+        return self._call(self.service.classify_text(text, model_name, policy, details, timeout))
+
+    def classify_all_text(self, text, policy=None, timeout=None):
+        return self._call(self.service.classify_all_text(text, policy, timeout))
+
+    def stats(self):
+        return self._call(self._stats())
+
+    async def _stats(self):
+        return self.service.stats()
+
+    def close(self, timeout=30.0):
+        """Drain the service and stop the event loop."""
+        if not self.loop.is_running():
+            return True
+        drained = self._call(self.service.drain(timeout))
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        return drained
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the service client shared by the whole process."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ServiceClient()
+                atexit.register(_client.close)
+    return _client
@@ -21,31 +21,25 @@
 
 """
 # Streamlit dependencies
-import pickle
-import sklearn
 import streamlit as st
-import joblib, os
+import os
+import tempfile
+import time
 
 # Data dependencies
 import pandas as pd
 
-# Function to load vectorizer and models
-def load_resources():
-    # Load vectorizer
-    vectorizer_path = "tfidf_vectorizer.pkl"
-    with open(vectorizer_path, 'rb') as f:
-        vectorizer = joblib.load(f)
-    
-    # Load models
-    mlr_model_path = "mlr_model.pkl"
-    nb_model_path = "nb_model.pkl"
-    rf_model_path = "gbc_model.pkl"
-    
-    mlr_model = joblib.load(open(mlr_model_path, "rb"))
-    nb_model = joblib.load(open(nb_model_path, "rb"))
-    rf_model = joblib.load(open(rf_model_path, "rb"))
-    
-    return vectorizer, mlr_model, nb_model, rf_model
+# Inference dependencies
+from model_registry import get_registry
+from inference import ENSEMBLE_CHOICE
+from metrics import metrics, profile_call
+from prediction_cache import get_cache
+from batch_classify import classify_csv
+from input_guard import BudgetExceeded, InputPolicy, InputRejected, check_input, run_served
+from async_service import ServiceUnavailable, get_client
+from model_versions import get_version_manager
+from insights import (TERMS_COLUMN, category_distribution, compute_insights, length_histogram,
+                      length_summary, top_terms)
 
 # Main function where we will build the actual app
 def main():
@@ -60,7 +54,7 @@ def main():
     st.subheader("Analyzing news articles")
 
     # Define navigation menu options in the desired order
-    menu = ["Home", "Overview", "Insights", "About Us"]
+    menu = ["Home", "Overview", "Insights", "Performance", "Model Versions", "About Us"]
     choice = st.sidebar.selectbox('Navigation', menu)
 
     # Building out the selected page
@@ -73,11 +67,22 @@ def main():
     elif choice == 'Insights':
         show_insights_page()
 
+    elif choice == 'Performance':
+        show_performance_page()
+
+    elif choice == 'Model Versions':
+        show_versions_page()
+
     elif choice == 'About Us':
         show_about_us_page()
 
 def show_home_page():
     st.info("**Prediction with ML Models**")
+    mode = st.radio("Mode", ("Single text", "Batch (CSV upload)"), horizontal=True)
+    if mode == "Batch (CSV upload)":
+        show_batch_classification()
+        return
+
     # Creating a text box for user input
     news_text = st.text_area("Enter Text", "Type Here")
 
@@ -99,52 +104,146 @@ def show_home_page():
     """)
 
     # Model selection dropdown
-    model_choice = st.selectbox("Choose Model", ("Logistic Regression", "Naive Bayes", "Random Forest"))
+    model_choice = st.selectbox("Choose Model", ("Logistic Regression", "Naive Bayes", "Random Forest", ENSEMBLE_CHOICE))
+
+    profile = st.checkbox("Profile this request (cProfile)")
+    show_explanation = st.checkbox("Show top categories and key terms")
 
     if st.button("Classify"):
-        # Load resources
-        vectorizer, mlr_model, nb_model, gbc_model = load_resources()
-
-        # Transforming user input with vectorizer
-        vect_text = vectorizer.transform([news_text]).toarray()
-
-        # Make predictions based on selected model
-        if model_choice == "Logistic Regression":
-            prediction = mlr_model.predict(vect_text)
-            category_map = {
-            0: "Business",
-            1: "Education",
-            2: "Technology",
-            3: "Sport",
-            4: "Entertainment",
-            # Add more categories as needed
-            }
-        elif model_choice == "Naive Bayes":
-            prediction = nb_model.predict(vect_text)
-            category_map = {
-            0: "Business",
-            1: "Education",
-            2: "Entertainment",
-            3: "Sport",
-            4: "Technology",
-            # Add more categories as needed
-            }
-        elif model_choice == "Random Forest":
-            prediction = gbc_model.predict(vect_text)
-            category_map = {
-            0: "Business",
-            1: "Education",
-            2: "Entertainment",
-            3: "Sport",
-            4: "Technology",
-            # Add more categories as needed
-            }
-
-        # Get predicted category name
-        predicted_category = category_map.get(prediction[0], "Unknown")  # Default to "Unknown" if prediction not found
-
-        # Display predicted category
-        st.success("Predicted Category: {}".format(predicted_category))
+        if model_choice == ENSEMBLE_CHOICE:
+            show_ensemble_result(news_text)
+        elif profile:
+            show_profile_result(news_text, model_choice)
+        else:
+            # Repeated texts are served from the prediction cache; otherwise only
+            # the vectorizer and the selected model are loaded, and only once.
+            # Very long articles are chunked or truncated by the input guard.
+            # The shared inference service caps concurrent work across sessions
+            # and gives up once the request's time budget is spent.
+            try:
+                result, info = get_client().classify_text(
+                    news_text, model_choice, details=(3, 10) if show_explanation else None)
+            except (InputRejected, BudgetExceeded, ServiceUnavailable) as exc:
+                st.error(str(exc))
+            else:
+                show_input_notes(info)
+
+                # Get predicted category name
+                predicted_category = result["category"]
+
+                # Display predicted category
+                st.success("Predicted Category: {}".format(predicted_category))
+                if show_explanation:
+                    show_explanation_result(result, info)
+
+    # Registry statistics: cache hits, loads and unpickling time per artifact
+    with st.expander("Model registry stats"):
+        st.json(get_registry().stats())
+    with st.expander("Prediction cache stats"):
+        st.json(get_cache().stats())
+    with st.expander("Inference service stats"):
+        st.json(get_client().stats())
+
+def show_explanation_result(result, info):
+    """Show the top categories and the terms that drove the prediction."""
+    top = pd.DataFrame(result["top_k"]).set_index("category")
+    st.bar_chart(top["probability"])
+    if result["terms"]:
+        st.markdown("**Terms that favoured {}**".format(result["category"]))
+        st.dataframe(pd.DataFrame(result["terms"]).set_index("term"))
+    else:
+        st.caption("Key terms are only available for the linear models.")
+    stages = info["stages"]
+    st.caption("Transform {:.2f} ms, predict {:.2f} ms, explanation added {:.2f} ms".format(
+        stages["transform"] * 1000, stages["predict"] * 1000, stages["explain"] * 1000))
+
+
+def show_input_notes(info):
+    """Say how the input guard handled a long text."""
+    if info["mode"] == "chunk":
+        st.warning("Long text ({:,} characters) was vectorized in {} windows.".format(
+            info["chars"], info["windows"]))
+    if info["truncated_to"]:
+        st.warning("Long text was truncated to its first {:,} of {:,} characters.".format(
+            info["truncated_to"], info["chars"]))
+
+
+def show_profile_result(news_text, model_choice):
+    # Bypass the prediction cache so the profile shows the real work.
+    # Profiling always uses the served model, never a staged candidate.
+    # It runs in this session so cProfile sees it, under the input guard's
+    # limits and time budget.
+    policy = InputPolicy.from_env()
+    try:
+        info = check_input(news_text, policy)
+        deadline = time.monotonic() + policy.time_budget if policy.time_budget else None
+        result, report = profile_call(run_served, news_text, model_choice, policy, deadline)
+    except (InputRejected, BudgetExceeded) as exc:
+        st.error(str(exc))
+        return
+    show_input_notes(info)
+    st.success("Predicted Category: {}".format(result["category"]))
+    with st.expander("cProfile report", expanded=True):
+        st.code(report)
+
+
+def show_ensemble_result(news_text):
+    # One TF-IDF transform, all models scored concurrently. The ensemble
+    # always uses the served models, never a staged candidate. Long texts
+    # are chunked, truncated or rejected by the input guard.
+    try:
+        ensemble, info = get_client().classify_all_text(news_text)
+    except (InputRejected, BudgetExceeded, ServiceUnavailable) as exc:
+        st.error(str(exc))
+        return
+    show_input_notes(info)
+
+    rows = []
+    for name, result in ensemble["models"].items():
+        rows.append({
+            "Model": name,
+            "Predicted Category": result["categories"][0],
+            "Confidence": "{:.1%}".format(result["probabilities"][0].max()),
+            "Latency (ms)": round(result["seconds"] * 1000, 2),
+        })
+    st.table(pd.DataFrame(rows).set_index("Model"))
+    st.caption("TF-IDF transform: {:.2f} ms, shared by all models".format(ensemble["vectorize_seconds"] * 1000))
+
+    st.success("Majority Vote: {}".format(ensemble["majority_vote"][0]))
+    st.success("Probability-Averaged Vote: {}".format(ensemble["average_vote"][0]))
+
+def show_batch_classification():
+    st.markdown("Upload a CSV shaped like `test.csv` (headlines, description, content, url, category). "
+                "Rows are classified in chunks using the **content** column and written to a downloadable CSV.")
+    uploaded = st.file_uploader("Upload CSV", type="csv")
+    model_choice = st.selectbox("Choose Model", ("Logistic Regression", "Naive Bayes", "Random Forest"))
+    chunk_size = st.number_input("Rows per chunk", min_value=100, max_value=50000, value=1000, step=100)
+
+    if uploaded is not None and st.button("Classify File"):
+        progress_bar = st.progress(0.0)
+        status = st.empty()
+
+        def report(rows, fraction):
+            if fraction is not None:
+                progress_bar.progress(fraction)
+            status.text("Classified {} rows".format(rows))
+
+        # Results are streamed to a temporary file rather than held in memory
+        out = tempfile.NamedTemporaryFile("w", suffix=".csv", newline="",
+                                          encoding="utf-8", delete=False)
+        try:
+            with out:
+                rows = classify_csv(uploaded, out, model_choice,
+                                    chunksize=int(chunk_size), progress=report)
+            progress_bar.progress(1.0)
+            st.success("Classified {} rows".format(rows))
+
+            with open(out.name, "rb") as f:
+                st.download_button("Download Predictions", f, file_name="predictions.csv", mime="text/csv")
+        except ValueError as exc:
+            st.error(str(exc))
+        finally:
+            os.remove(out.name)
 
 def show_overview_page():
     st.info("**Proudly brought to you by DataInsight Solutions!**")
@@ -176,29 +275,120 @@ def show_overview_page():
     st.video("Breaking News Video.mp4")
 
 def show_insights_page():
-    st.info("**Word Cloud Visualizations**")
-    wc_choice = st.selectbox("Choose Category for Word Cloud", ("Education", "Technology", "Business", "Entertainment", "Sport"))
-    wc_images = {
-        "Education": "WordCloud_Education.png",
-        "Technology": "WordCloud_Technology.png",
-        "Business": "WordCloud_Business.png",
-        "Entertainment": "WordCloud_Entertainment.png",
-        "Sport": "WordCloud_Sport.png"
-    }
-
-    # Display the selected word cloud image
-    if wc_choice in wc_images:
-        st.image(wc_images[wc_choice], use_column_width=True)
-        
+    st.info("**Dataset Insights**")
+    data_path = st.text_input("CSV file", "test.csv")
+    if not os.path.exists(data_path):
+        st.error("File not found: {}".format(data_path))
+        return
+
+    # Computed from the file itself; cached on its hash and updated
+    # incrementally when rows are appended
+    try:
+        stats, mode = compute_insights(data_path)
+    except ValueError as exc:
+        st.error(str(exc))
+        return
+    st.caption("{:,} articles ({} results)".format(stats["rows"], mode))
+    if not stats["rows"]:
+        st.warning("The file has a header but no rows, so there is nothing to show.")
+        return
+
+    # Top TF-IDF terms per category, for files that have a content column
+    categories = category_distribution(stats)
+    with_terms = [c for c in categories.index if c in stats["tfidf_sums"]]
+    if with_terms:
+        term_choice = st.selectbox("Choose Category for Top Terms", [c.title() for c in with_terms])
+        st.markdown("Terms with the highest average TF-IDF weight in **{}** articles.".format(term_choice))
+        st.bar_chart(top_terms(stats, term_choice.lower()))
+    else:
+        st.warning("No '{}' column, so top terms are not available.".format(TERMS_COLUMN))
+
     # Distribution of Categories
     if st.checkbox("Distribution of Categories"):
-        st.markdown("As observed in the analysis below, **Education** is the top category, with more than 1400 entries. From this plot, we further observe that **Sport** is the category with the least entries, less than 800.")
-        st.image("category_distribution.png")
+        distribution = categories.rename(index=str.title)
+        st.markdown("**{}** is the largest category with {:,} entries and **{}** the smallest with {:,}.".format(
+            distribution.index[0], distribution.iloc[0], distribution.index[-1], distribution.iloc[-1]))
+        st.bar_chart(distribution)
 
     # Text Length Analysis
     if st.checkbox("Text Length Analysis"):
-        st.markdown("The Text length analysis below shows that descriptions vary widely in length, with most content entries being concise and under 2000 characters. Headlines are typically shorter, with most containing less than 100 characters, though there is some variation in their lengths.")
-        st.image("text_length_analysis.png")
+        columns = [c for c in ("content", "description", "headlines") if stats["lengths"][c]["count"]]
+        if columns:
+            column = st.selectbox("Text Column", columns)
+            st.markdown("Length of **{}** in characters, per category.".format(column))
+            st.dataframe(length_summary(stats, column).rename(index=str.title), use_container_width=True)
+            st.bar_chart(length_histogram(stats, column))
+        else:
+            st.warning("No 'content', 'description' or 'headlines' column, so text lengths are not available.")
+
+def show_performance_page():
+    st.info("**Inference Performance**")
+    st.markdown("Latency of each inference stage since the server started: reading artifacts from disk, "
+                "unpickling, the TF-IDF transform, sparse-to-dense conversion and prediction.")
+
+    summary = metrics.summary()
+    if not summary:
+        st.markdown("No requests have been timed yet. Classify some text on the Home page first.")
+    else:
+        table = pd.DataFrame(summary).set_index(["stage", "model"])
+        st.dataframe(table.round(3), use_container_width=True)
+
+        st.subheader("Total time per stage (s)")
+        st.bar_chart(table.groupby(level="stage")["total_s"].sum())
+
+        selected = st.selectbox("Stage", sorted(table.index.get_level_values("stage").unique()))
+        st.bar_chart(table.loc[selected][["p50_ms", "p95_ms", "p99_ms"]])
+
+    with st.expander("Prometheus metrics"):
+        st.code(metrics.prometheus_text(), language="text")
+    with st.expander("Model registry stats"):
+        st.json(get_registry().stats())
+
+    if st.button("Reset Metrics"):
+        metrics.reset()
+        st.rerun()
+
+def show_versions_page():
+    st.info("**Model Versions**")
+    st.markdown("Load a retrained model next to the one being served, send part of the traffic to it "
+                "and promote it once it looks good, all without restarting the app. "
+                "Loading and warm-up run in the background. Single-text and batch classification, "
+                "explanations and the API are routed; the ensemble and cProfile options always "
+                "use the served model.")
+    versions = get_version_manager()
+    model_name = st.selectbox("Model", list(get_registry().model_paths))
+
+    path = st.text_input("Candidate model file", placeholder="e.g. mlr_model.v2.pkl")
+    if st.button("Load candidate") and path:
+        versions.stage(model_name, path)
+
+    stats = versions.stats()[model_name]
+    if stats["status"]:
+        status = stats["status"]
+        if status["state"] == "failed":
+            st.error("Loading {} failed: {}".format(status["path"], status["error"]))
+        else:
+            st.caption("{}: {}".format(status["state"].capitalize(), status["path"]))
+
+    if stats["candidate"]:
+        share = st.slider("Share of traffic sent to the candidate (%)", 0, 100, int(stats["share"] * 100))
+        if share != int(stats["share"] * 100):
+            versions.set_share(model_name, share / 100.0)
+        promote, discard = st.columns(2)
+        if promote.button("Promote candidate"):
+            versions.promote(model_name)
+            st.rerun()
+        if discard.button("Discard candidate"):
+            versions.discard(model_name)
+            st.rerun()
+    if stats["can_roll_back"] and st.button("Roll back last promotion"):
+        versions.rollback(model_name)
+        st.rerun()
+
+    rows = [dict(version, role=role) for role, version in
+            (("incumbent", stats["incumbent"]), ("candidate", stats["candidate"])) if version]
+    st.dataframe(pd.DataFrame(rows).set_index("role"), use_container_width=True)
+    st.button("Refresh")
 
 def show_about_us_page():
     st.info("**About Us**")
@@ -0,0 +1,119 @@
+"""
+    Batch classification of news feeds stored as CSV files.
+
+    Description: The input is read in fixed-size chunks. Each chunk is
+    vectorized and predicted with a single matrix call and appended to the
+    output CSV before the next one is read, so memory use depends on the
+    chunk size rather than on the number of rows in the file.
+
+    Each chunk is one call through the model version manager, so while a
+    candidate is staged its share of the chunks is scored by the candidate
+    (see model_versions.py).
+
+    Usage:
+
+        python batch_classify.py test.csv -o predictions.csv --model "Naive Bayes"
+
+"""
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+from inference import classify_matrix, vectorize
+from model_registry import MODEL_PATHS, get_registry
+from model_versions import routed_score
+
+TEXT_COLUMN = "content"
+PREDICTION_COLUMN = "predicted_category"
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def _input_size(src):
+    if hasattr(src, "seek"):
+        pos = src.tell()
+        size = src.seek(0, os.SEEK_END)
+        src.seek(pos)
+        return size
+    return os.path.getsize(src)
+
+
+def _input_position(src, reader):
+    handle = src if hasattr(src, "tell") else getattr(reader, "handles", None)
+    handle = getattr(handle, "handle", handle)
+    try:
+        return handle.tell()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def iter_predictions(src, model_name, chunksize=DEFAULT_CHUNK_SIZE,
+                     text_column=TEXT_COLUMN, registry=None):
+    """Yield each chunk of ``src`` with a column of predicted categories.
+
+    Chunks are routed between model versions unless a ``registry`` is
+    given, in which case its model is used directly.
+    """
+    vectorizer = (registry or get_registry()).get_vectorizer()
+
+    with pd.read_csv(src, chunksize=chunksize) as reader:
+        for chunk in reader:
+            if text_column not in chunk.columns:
+                raise ValueError("Input has no '{}' column".format(text_column))
+            texts = chunk[text_column].fillna("").astype(str)
+            X = vectorize(vectorizer, texts)
+            if registry is None:
+                results = routed_score(X, model_name)[0]
+            else:
+                results = classify_matrix(X, model_name, registry)
+            chunk[PREDICTION_COLUMN] = [result["category"] for result in results]
+            yield chunk, _input_position(src, reader)
+
+
+def classify_csv(src, dst, model_name, chunksize=DEFAULT_CHUNK_SIZE,
+                 text_column=TEXT_COLUMN, progress=None, registry=None):
+    """Classify every row of ``src`` and stream the results to ``dst``.
+
+    ``src`` and ``dst`` may be paths or open file objects. ``progress`` is
+    called after every chunk with the number of rows written so far and the
+    fraction of the input consumed. Returns the total number of rows.
+    """
+    total_bytes = _input_size(src)
+    rows = 0
+    out = open(dst, "w", newline="", encoding="utf-8") if isinstance(dst, str) else dst
+    try:
+        chunks = iter_predictions(src, model_name, chunksize, text_column, registry)
+        for chunk, position in chunks:
+            chunk.to_csv(out, header=(rows == 0), index=False)
+            rows += len(chunk)
+            if progress is not None:
+                fraction = min(position / total_bytes, 1.0) if position and total_bytes else None
+                progress(rows, fraction)
+    finally:
+        if out is not dst:
+            out.close()
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classify a CSV news feed in chunks.")
+    parser.add_argument("input", help="CSV file shaped like test.csv")
+    parser.add_argument("-o", "--output", help="output CSV (default: stdout)")
+    parser.add_argument("-m", "--model", default="Logistic Regression", choices=list(MODEL_PATHS))
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--text-column", default=TEXT_COLUMN)
+    args = parser.parse_args(argv)
+
+    def report(rows, fraction):
+        done = " ({:.0%})".format(fraction) if fraction is not None else ""
+        print("Classified {} rows{}".format(rows, done), file=sys.stderr)
+
+    rows = classify_csv(args.input, args.output or sys.stdout, args.model,
+                        chunksize=args.chunk_size, text_column=args.text_column,
+                        progress=report)
+    print("Done: {} rows".format(rows), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+    Cold-start time and memory: pickled artifacts versus the NumPy bundle.
+
+    Each variant runs in a fresh interpreter that imports what it needs,
+    loads the artifacts and classifies one text, so the numbers include
+    import time. Usage:
+
+        python benchmarks/cold_start.py --repeat 5
+
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TEXT = "The striker scored twice as the home side won the league title"
+
+# Loads all four artifacts the way the app always did
+PICKLE_SCRIPT = """
+import joblib
+vectorizer = joblib.load("tfidf_vectorizer.pkl")
+models = {{name: joblib.load(name) for name in ("mlr_model.pkl", "nb_model.pkl", "gbc_model.pkl")}}
+models["nb_model.pkl"].predict(vectorizer.transform([{text!r}]))
+"""
+
+BUNDLE_SCRIPT = """
+from artifact_bundle import Bundle
+Bundle({bundle!r}).classify([{text!r}], "Naive Bayes")
+"""
+
+# Appended to both: report elapsed time, peak RSS and whether sklearn was imported
+REPORT = """
+import json, resource, sys, time
+print(json.dumps({
+    "seconds": time.perf_counter() - START,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+    "imported_sklearn": "sklearn" in sys.modules,
+}))
+"""
+
+
+def run(script, repeat):
+    code = "import time\nSTART = time.perf_counter()\n" + script + REPORT
+    runs = [
+        json.loads(subprocess.check_output([sys.executable, "-c", code], cwd=ROOT))
+        for _ in range(repeat)
+    ]
+    return {
+        "seconds": statistics.median(r["seconds"] for r in runs),
+        "peak_rss_mb": statistics.median(r["peak_rss_mb"] for r in runs),
+        "imported_sklearn": runs[0]["imported_sklearn"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--bundle", help="existing bundle directory (default: export a fresh one)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bundle = args.bundle
+        if bundle is None:
+            bundle = os.path.join(tmp, "bundle")
+            subprocess.check_call([sys.executable, "artifact_bundle.py", "export", bundle],
+                                  cwd=ROOT, stdout=subprocess.DEVNULL)
+        results = {
+            "pickle": run(PICKLE_SCRIPT.format(text=TEXT), args.repeat),
+            "bundle": run(BUNDLE_SCRIPT.format(bundle=os.path.abspath(bundle), text=TEXT), args.repeat),
+        }
+
+    print("{:<8} {:>10} {:>14} {:>10}".format("variant", "seconds", "peak RSS (MB)", "sklearn"))
+    for name, result in results.items():
+        print("{:<8} {:>10.3f} {:>14.1f} {:>10}".format(
+            name, result["seconds"], result["peak_rss_mb"], str(result["imported_sklearn"])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+    Offline speed and accuracy benchmark over test.csv.
+
+    Runs the vectorizer plus each shipped model at several batch sizes and
+    reports throughput, batch latency percentiles, peak memory, artifact
+    load times and accuracy/F1 against the ``category`` column. Results are
+    written as JSON so runs can be compared across model versions:
+
+        python benchmarks/evaluate.py --batch-sizes 1 32 256 2000 -o results.json
+        python benchmarks/evaluate.py --baseline results.json
+
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.metrics import accuracy_score, f1_score
+
+from inference import predict, vectorize
+from model_registry import MODEL_PATHS, ModelRegistry
+
+DEFAULT_BATCH_SIZES = (1, 32, 256, 2000)
+
+# Dataset category values that differ from the model labels beyond case
+DATASET_LABELS = {"sports": "Sport"}
+
+
+def dataset_labels(categories):
+    """Map the dataset's category column onto the model label names."""
+    categories = categories.str.strip().str.lower()
+    return categories.map(DATASET_LABELS).fillna(categories.str.capitalize()).to_numpy()
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+def load_artifacts(registry):
+    """Load every artifact once, returning their load times in seconds."""
+    registry.get_vectorizer()
+    for name in MODEL_PATHS:
+        registry.get_model(name)
+    return {path: info["load_seconds"] for path, info in registry.stats()["artifacts"].items()}
+
+
+def run_model(registry, name, texts, batch_size):
+    vectorizer = registry.get_vectorizer()
+    model = registry.get_model(name)
+    schema = registry.get_labels(name)
+
+    latencies = []
+    predictions = []
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        batch_start = time.perf_counter()
+        codes = predict(model, vectorize(vectorizer, texts[i:i + batch_size]))
+        latencies.append(time.perf_counter() - batch_start)
+        predictions.append(schema.decode(codes))
+    elapsed = time.perf_counter() - start
+
+    # Memory is traced in a separate pass because tracing slows every
+    # allocation down and would distort the timings above
+    tracemalloc.start()
+    for i in range(0, len(texts), batch_size):
+        schema.decode(predict(model, vectorize(vectorizer, texts[i:i + batch_size])))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies_ms = np.asarray(latencies) * 1000.0
+    return np.concatenate(predictions), {
+        "batch_size": batch_size,
+        "batches": len(latencies),
+        "seconds": elapsed,
+        "docs_per_second": len(texts) / elapsed,
+        "latency_ms": {
+            "p50": float(np.percentile(latencies_ms, 50)),
+            "p95": float(np.percentile(latencies_ms, 95)),
+            "p99": float(np.percentile(latencies_ms, 99)),
+        },
+        "peak_traced_mb": peak / (1024.0 * 1024.0),
+    }
+
+
+def evaluate(data, batch_sizes, text_column="content"):
+    registry = ModelRegistry()
+    load_seconds = load_artifacts(registry)
+    frame = pd.read_csv(data)
+    texts = frame[text_column].fillna("").astype(str).tolist()
+    truth = dataset_labels(frame["category"])
+
+    models = {}
+    for name in MODEL_PATHS:
+        runs = []
+        for batch_size in batch_sizes:
+            predicted, run = run_model(registry, name, texts, batch_size)
+            runs.append(run)
+        models[name] = {
+            "artifact": MODEL_PATHS[name],
+            "sha256": registry.model_hash(name),
+            "accuracy": float(accuracy_score(truth, predicted)),
+            "f1_macro": float(f1_score(truth, predicted, average="macro")),
+            "runs": runs,
+        }
+
+    return {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "data": os.path.basename(data),
+        "rows": len(texts),
+        "environment": {
+            "python": platform.python_version(),
+            "scikit-learn": sklearn.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+        },
+        "load_seconds": load_seconds,
+        "peak_rss_mb": peak_rss_mb(),
+        "models": models,
+    }
+
+
+def print_report(results, baseline=None):
+    print("{:<22} {:>6} {:>11} {:>9} {:>9} {:>9} {:>8} {:>9} {:>8}".format(
+        "model", "batch", "docs/s", "p50 ms", "p95 ms", "p99 ms", "peak MB", "accuracy", "F1"))
+    for name, model in results["models"].items():
+        for run in model["runs"]:
+            print("{:<22} {:>6} {:>11.0f} {:>9.2f} {:>9.2f} {:>9.2f} {:>8.1f} {:>9.4f} {:>8.4f}".format(
+                name, run["batch_size"], run["docs_per_second"], run["latency_ms"]["p50"],
+                run["latency_ms"]["p95"], run["latency_ms"]["p99"], run["peak_traced_mb"],
+                model["accuracy"], model["f1_macro"]))
+    print("Peak RSS: {:.1f} MB".format(results["peak_rss_mb"]))
+    for path, seconds in results["load_seconds"].items():
+        print("Load {:<22} {:.3f} s".format(path, seconds))
+
+    if baseline is None:
+        return
+    print("\nChange against baseline from {}:".format(baseline["created"]))
+    for name, model in results["models"].items():
+        before = baseline["models"].get(name)
+        if before is None:
+            continue
+        changed = " (model changed)" if before["sha256"] != model["sha256"] else ""
+        print("{:<22} accuracy {:+.4f}  F1 {:+.4f}{}".format(
+            name, model["accuracy"] - before["accuracy"],
+            model["f1_macro"] - before["f1_macro"], changed))
+        previous = {run["batch_size"]: run for run in before["runs"]}
+        for run in model["runs"]:
+            if run["batch_size"] in previous:
+                ratio = run["docs_per_second"] / previous[run["batch_size"]]["docs_per_second"]
+                print("    batch {:>6}: throughput {:+.1%}".format(run["batch_size"], ratio - 1))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark and evaluate the shipped models.")
+    parser.add_argument("--data", default=os.path.join(ROOT, "test.csv"))
+    parser.add_argument("--text-column", default="content")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=list(DEFAULT_BATCH_SIZES))
+    parser.add_argument("-o", "--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    results = evaluate(args.data, args.batch_sizes, args.text_column)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print("Wrote {}".format(args.output))
+
+
+if __name__ == "__main__":
+    main()
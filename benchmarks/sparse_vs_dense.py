@@ -0,0 +1,131 @@
+"""
+    Compare the sparse and dense prediction paths on test.csv.
+
+    Each path runs in its own child process so that peak RSS is measured
+    independently. The memory column is how far each model's prediction
+    loop raised peak RSS above the RSS it started from; the artifacts and
+    data loaded before it are not counted. Memory the allocator kept from
+    an earlier model can be reused, so later models may read lower. Usage:
+
+        python benchmarks/sparse_vs_dense.py --batch-size 256 --repeat 3
+
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd
+
+from inference import needs_dense, vectorize
+from model_registry import MODEL_PATHS, get_registry
+
+
+def peak_rss_mb():
+    # VmHWM can be reset between measurements; ru_maxrss cannot
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+def reset_peak_rss():
+    """Start a new peak RSS measurement and return its baseline in MB.
+
+    On Linux the high-water mark is reset to the current RSS. Elsewhere
+    the peak so far is the baseline, so only growth beyond it shows.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def run_path(path, data, batch_size, repeat):
+    registry = get_registry()
+    vectorizer = registry.get_vectorizer()
+    models = {name: registry.get_model(name) for name in MODEL_PATHS}
+    texts = pd.read_csv(data)["content"].fillna("").tolist()
+    baseline = peak_rss_mb()
+
+    results = {}
+    for name, model in models.items():
+        start_rss = reset_peak_rss()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for i in range(0, len(texts), batch_size):
+                X = vectorize(vectorizer, texts[i:i + batch_size])
+                # Call the estimators directly: inference.predict would route
+                # the linear models through the NumPy scoring engine
+                if path == "dense" or needs_dense(model):
+                    model.predict(X.toarray())
+                else:
+                    model.predict(X)
+            timings.append(time.perf_counter() - start)
+        seconds = statistics.median(timings)
+        results[name] = {
+            "seconds": seconds,
+            "docs_per_second": len(texts) / seconds,
+            "added_rss_mb": peak_rss_mb() - start_rss,
+        }
+    return {
+        "path": path,
+        "rows": len(texts),
+        "batch_size": batch_size,
+        "baseline_rss_mb": baseline,
+        "peak_rss_mb": peak_rss_mb(),
+        "models": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--data", default=os.path.join(ROOT, "test.csv"))
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--path", choices=("sparse", "dense"),
+                        help="run a single path in this process")
+    args = parser.parse_args()
+
+    if args.path:
+        print(json.dumps(run_path(args.path, args.data, args.batch_size, args.repeat)))
+        return
+
+    reports = []
+    for path in ("sparse", "dense"):
+        out = subprocess.check_output([
+            sys.executable, os.path.abspath(__file__), "--path", path,
+            "--data", args.data, "--batch-size", str(args.batch_size),
+            "--repeat", str(args.repeat),
+        ])
+        reports.append(json.loads(out))
+
+    print("{:<8} {:<22} {:>10} {:>12} {:>16}".format(
+        "path", "model", "seconds", "docs/s", "added RSS (MB)"))
+    for report in reports:
+        for name, result in report["models"].items():
+            print("{:<8} {:<22} {:>10.3f} {:>12.0f} {:>16.1f}".format(
+                report["path"], name, result["seconds"],
+                result["docs_per_second"], result["added_rss_mb"]))
+    for report in reports:
+        print("{} baseline after loading: {:.1f} MB".format(report["path"], report["baseline_rss_mb"]))
+
+
+if __name__ == "__main__":
+    main()
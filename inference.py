@@ -0,0 +1,266 @@
+"""
+    Shared prediction path for the news classifier.
+
+    Description: TF-IDF features stay in the sparse CSR format produced by
+    the vectorizer and are handed to the estimators unchanged. Only models
+    that reject sparse input get a dense copy, and that decision is made
+    per model class rather than for every model. Logistic Regression and
+    Naive Bayes are scored by the NumPy engine in linear_scoring.py.
+
+    ``explain`` adds the top-k categories and, for the linear models, the
+    terms that contributed most to each prediction, taken from the same
+    sparse matrix that was scored.
+
+"""
+import time
+import weakref
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from linear_scoring import scorer_for
+from metrics import metrics
+from model_registry import MODEL_PATHS, get_registry
+
+ENSEMBLE_CHOICE = "All Models (Ensemble)"
+
+# Models are independent, so the ensemble scores them concurrently
+_ensemble_pool = ThreadPoolExecutor(max_workers=len(MODEL_PATHS), thread_name_prefix="ensemble")
+
+# Estimator classes known to require dense input. Classes that raise on a
+# sparse matrix at prediction time are added here automatically.
+DENSE_ONLY_MODELS = {"GaussianNB", "HistGradientBoostingClassifier"}
+
+
+def vectorize(vectorizer, texts):
+    """Transform ``texts`` into a sparse CSR TF-IDF matrix."""
+    with metrics.timed("transform", type(vectorizer).__name__):
+        return vectorizer.transform(texts).tocsr()
+
+
+def needs_dense(model):
+    """Return True if ``model`` has to be given a dense array."""
+    return type(model).__name__ in DENSE_ONLY_MODELS
+
+
+def _densify(model, X):
+    with metrics.timed("densify", type(model).__name__):
+        return X.toarray()
+
+
+def _call(model, method, X):
+    label = type(model).__name__
+    scorer = scorer_for(model)
+    if scorer is not None:
+        # Linear models are scored directly with NumPy/SciPy
+        with metrics.timed("predict", label):
+            return getattr(scorer, method)(X)
+    if needs_dense(model):
+        X = _densify(model, X)
+        with metrics.timed("predict", label):
+            return getattr(model, method)(X)
+    try:
+        with metrics.timed("predict", label):
+            return getattr(model, method)(X)
+    except TypeError:
+        # scikit-learn raises TypeError when dense data is required
+        DENSE_ONLY_MODELS.add(label)
+        X = _densify(model, X)
+        with metrics.timed("predict", label):
+            return getattr(model, method)(X)
+
+
+def predict(model, X):
+    """Predict class codes for the CSR matrix ``X``."""
+    return _call(model, "predict", X)
+
+
+def predict_proba(model, X):
+    """Predict class probabilities for the CSR matrix ``X``."""
+    return _call(model, "predict_proba", X)
+
+
+def classify_texts(texts, model_name, registry=None):
+    """Vectorize ``texts`` and return the named model's class codes."""
+    registry = registry or get_registry()
+    X = vectorize(registry.get_vectorizer(), texts)
+    return predict(registry.get_model(model_name), X)
+
+
+def decode(model_name, codes, registry=None):
+    """Map the named model's class codes to an array of category names."""
+    registry = registry or get_registry()
+    return registry.get_labels(model_name).decode(codes)
+
+
+def classify(texts, model_name, registry=None):
+    """Return the category and class probabilities for each of ``texts``.
+
+    The whole list is vectorized and scored with one matrix call per step.
+    """
+    with metrics.timed("classify", model_name):
+        return _classify(texts, model_name, registry)
+
+
+def _classify(texts, model_name, registry):
+    registry = registry or get_registry()
+    X = vectorize(registry.get_vectorizer(), texts)
+    return classify_matrix(X, model_name, registry)
+
+
+def classify_matrix(X, model_name, registry=None):
+    """Like ``classify`` for rows that have already been vectorized."""
+    registry = registry or get_registry()
+    probabilities = predict_proba(registry.get_model(model_name), X)
+    return format_results(probabilities, registry.get_labels(model_name).labels)
+
+
+def format_results(probabilities, labels):
+    """Turn a probability matrix into per-row category/probabilities dicts."""
+    categories = labels[probabilities.argmax(axis=1)]
+    labels = labels.tolist()
+    return [
+        {"category": category, "probabilities": dict(zip(labels, row.tolist()))}
+        for category, row in zip(categories, probabilities)
+    ]
+
+
+# Vocabulary terms in column order, one array per loaded vectorizer
+_feature_names = weakref.WeakKeyDictionary()
+
+
+def feature_names(vectorizer):
+    """Return the vectorizer's terms as an array indexed by column."""
+    names = _feature_names.get(vectorizer)
+    if names is None:
+        vocabulary = vectorizer.vocabulary_
+        names = _feature_names[vectorizer] = np.asarray(
+            sorted(vocabulary, key=vocabulary.get), dtype=object)
+    return names
+
+
+def explain(texts, model_name, top_k=3, n_terms=10, registry=None):
+    """Classify ``texts`` with their top-k categories and key terms.
+
+    Each result gains ``top_k``, the ``top_k`` most probable categories,
+    and ``terms``, the ``n_terms`` TF-IDF terms that pushed the predicted
+    category furthest ahead of the others (empty for models that are not
+    linear). Both are derived from the matrix and probabilities used for
+    the prediction, so the texts are transformed and scored only once.
+
+    Returns ``(results, seconds)``; ``seconds`` splits the time into
+    transform, predict and the added explain step.
+    """
+    registry = registry or get_registry()
+    start = time.perf_counter()
+    X = vectorize(registry.get_vectorizer(), texts)
+    transformed = time.perf_counter()
+    results, seconds = explain_matrix(X, model_name, top_k, n_terms, registry)
+    return results, dict(seconds, transform=transformed - start)
+
+
+def explain_matrix(X, model_name, top_k=3, n_terms=10, registry=None, model=None, labels=None):
+    """Like ``explain`` for rows that have already been vectorized.
+
+    ``model`` and ``labels`` replace the registered model and its labels,
+    e.g. to explain a candidate version (see model_versions.py).
+    """
+    registry = registry or get_registry()
+    if model is None:
+        model = registry.get_model(model_name)
+        labels = registry.get_labels(model_name).labels
+
+    start = time.perf_counter()
+    probabilities = predict_proba(model, X)
+    predicted = time.perf_counter()
+
+    with metrics.timed("explain", model_name):
+        results = format_results(probabilities, labels)
+        ranked = np.argsort(-probabilities, axis=1)[:, :top_k]
+        for result, row, order in zip(results, probabilities, ranked):
+            result["top_k"] = [
+                {"category": labels[i], "probability": float(row[i])} for i in order]
+            result["terms"] = []
+
+        scorer = scorer_for(model)
+        if scorer is not None and n_terms:
+            indptr, indices, contributions = scorer.top_contributions(
+                X, probabilities.argmax(axis=1), n_terms)
+            names = feature_names(registry.get_vectorizer())
+            for row, result in enumerate(results):
+                span = slice(indptr[row], indptr[row + 1])
+                result["terms"] = [
+                    {"term": term, "contribution": float(value)}
+                    for term, value in zip(names[indices[span]], contributions[span])]
+    explained = time.perf_counter()
+
+    return results, {"predict": predicted - start, "explain": explained - predicted}
+
+
+def _score(model_name, model, X):
+    start = time.perf_counter()
+    probabilities = predict_proba(model, X)
+    seconds = time.perf_counter() - start
+    return model_name, probabilities, seconds
+
+
+def classify_all(texts, registry=None):
+    """Score ``texts`` with every model and combine them into an ensemble.
+
+    The texts are vectorized once and the models run concurrently on the
+    same sparse matrix. Returns per-model categories, probabilities and
+    latency together with a majority vote and a probability-averaged vote.
+    """
+    registry = registry or get_registry()
+    start = time.perf_counter()
+    X = vectorize(registry.get_vectorizer(), texts)
+    vectorize_seconds = time.perf_counter() - start
+    return dict(classify_all_matrix(X, registry), vectorize_seconds=vectorize_seconds)
+
+
+def classify_all_matrix(X, registry=None):
+    """Like ``classify_all`` for rows that have already been vectorized.
+
+    The result has no ``vectorize_seconds``.
+    """
+    registry = registry or get_registry()
+    futures = [
+        _ensemble_pool.submit(_score, name, registry.get_model(name), X)
+        for name in MODEL_PATHS
+    ]
+
+    # Probabilities are aligned on category names so that models with
+    # different class orders can be combined
+    schemas = {name: registry.get_labels(name) for name in MODEL_PATHS}
+    labels = sorted({label for schema in schemas.values() for label in schema.labels})
+    column = {label: i for i, label in enumerate(labels)}
+    total = np.zeros((X.shape[0], len(labels)))
+    models = {}
+    for future in futures:
+        name, probabilities, seconds = future.result()
+        aligned = np.zeros_like(total)
+        aligned[:, [column[label] for label in schemas[name].labels]] = probabilities
+        total += aligned
+        models[name] = {
+            "categories": [labels[i] for i in aligned.argmax(axis=1)],
+            "probabilities": aligned,
+            "seconds": seconds,
+        }
+
+    average = total / len(models)
+    averaged = [labels[i] for i in average.argmax(axis=1)]
+    majority = []
+    for row, fallback in enumerate(averaged):
+        votes = Counter(result["categories"][row] for result in models.values())
+        (top, count), = votes.most_common(1)
+        # Without a strict majority the averaged probabilities decide
+        majority.append(top if count > len(models) / 2 else fallback)
+
+    return {
+        "labels": labels,
+        "models": models,
+        "majority_vote": majority,
+        "average_vote": averaged,
+        "average_probabilities": average,
+    }
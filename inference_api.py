@@ -0,0 +1,313 @@
+"""
+    Headless JSON HTTP API for the news classifier.
+
+    Description: Serves the same vectorizer and models as the Streamlit app
+    (through the shared model registry) without a browser session.
+    Connections are kept alive (HTTP/1.1), each on its own lightweight
+    thread, so idle clients do not hold up anyone else. Only the prediction
+    work is bounded: at most --workers predictions outside the
+    micro-batchers run at once, and at most --max-connections connections
+    are open at a time.
+
+    Endpoints:
+
+        GET  /health         liveness check
+        GET  /models         available model names
+        POST /predict        {"text": "...", "model": "Naive Bayes"}
+        POST /predict_batch  {"texts": ["...", "..."], "model": "Naive Bayes"}
+        GET  /stats          registry, micro-batching, cache and model version statistics
+        GET  /metrics        per-stage latency histograms (Prometheus text format)
+
+    Concurrent /predict calls are coalesced into batched model calls by a
+    micro-batcher per model (see micro_batcher.py) unless
+    --micro-batch-wait-ms is 0.
+
+    Adding "explain": true to either POST body returns the top-k
+    categories and key terms of each prediction (see inference.explain);
+    "top_k" and "terms" set how many. Explained requests skip the prediction
+    cache and micro-batching.
+
+    Texts longer than CLASSIFIER_MAX_CHARS go through the input guard (see
+    input_guard.py): /predict chunks, truncates or rejects them (413) and
+    answers 504 when the time budget runs out; /predict_batch rejects them.
+
+    Every request gets a JSON answer: malformed requests (including a bad
+    Content-Length) get 400, and unexpected failures are logged to stderr
+    and answered with 500.
+
+    Usage:
+
+        python inference_api.py --port 8000 --workers 8 --max-connections 512
+
+"""
+import argparse
+import json
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from input_guard import BudgetExceeded, InputPolicy, InputRejected, guarded_classify
+from micro_batcher import DEFAULT_MAX_BATCH_SIZE as DEFAULT_MICRO_BATCH_SIZE
+from micro_batcher import DEFAULT_MAX_WAIT_MS as DEFAULT_MICRO_BATCH_WAIT_MS
+from micro_batcher import batcher_stats, get_batcher
+from metrics import metrics
+from model_registry import MODEL_PATHS, get_registry
+from model_versions import get_version_manager, routed_classify, routed_explain
+from prediction_cache import get_cache
+
+DEFAULT_MODEL = "Logistic Regression"
+DEFAULT_MAX_BATCH_SIZE = 1000
+DEFAULT_MAX_CONNECTIONS = 256
+
+
+class ApiError(Exception):
+    """An error reported to the client with an HTTP status code."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class ApiHTTPServer(ThreadingHTTPServer):
+    """Thread-per-connection HTTP server with a cap on concurrent predictions.
+
+    An idle keep-alive connection only ties up its own thread. ``workers``
+    bounds how many unbatched prediction requests are processed at once
+    (micro-batched /predict calls are bounded by their batcher), and
+    connections beyond ``max_connections`` are closed straight away.
+    """
+
+    request_queue_size = 128
+    daemon_threads = True
+
+    def __init__(self, address, handler, workers=4, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 micro_batch_size=DEFAULT_MICRO_BATCH_SIZE,
+                 micro_batch_wait_ms=DEFAULT_MICRO_BATCH_WAIT_MS,
+                 max_connections=DEFAULT_MAX_CONNECTIONS):
+        super().__init__(address, handler)
+        self.max_batch_size = max_batch_size
+        self.micro_batch_size = micro_batch_size
+        self.micro_batch_wait_ms = micro_batch_wait_ms
+        self.input_policy = InputPolicy.from_env()
+        self.prediction_slots = threading.BoundedSemaphore(workers)
+        self._connections = threading.BoundedSemaphore(max_connections)
+
+    def process_request(self, request, client_address):
+        if not self._connections.acquire(blocking=False):
+            self.shutdown_request(request)
+            return
+        try:
+            super().process_request(request, client_address)
+        except Exception:
+            self._connections.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._connections.release()
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    """Routes API requests to the shared inference path."""
+
+    protocol_version = "HTTP/1.1"
+    # Idle keep-alive connections are closed after this many seconds
+    timeout = 10
+
+    def log_message(self, format, *args):
+        # Per-request access logs are too noisy at high request rates
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_text(self, status, text, content_type="text/plain; version=0.0.4"):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        # Always drain the body so the kept-alive connection stays in sync
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # The body cannot be skipped, so the connection cannot be reused
+            self.close_connection = True
+            raise ApiError(400, "Invalid Content-Length header")
+        self._body = self.rfile.read(length) if length else b""
+
+    def _read_json(self):
+        try:
+            payload = json.loads(self._body or b"{}")
+        except ValueError:
+            raise ApiError(400, "Request body is not valid JSON")
+        if not isinstance(payload, dict):
+            raise ApiError(400, "Request body must be a JSON object")
+        return payload
+
+    def _model_name(self, payload):
+        name = payload.get("model", DEFAULT_MODEL)
+        if name not in MODEL_PATHS:
+            raise ApiError(400, "Unknown model '{}', choose one of {}".format(name, list(MODEL_PATHS)))
+        return name
+
+    def _dispatch(self, routes):
+        route = routes.get(self.path.split("?", 1)[0])
+        try:
+            if route is None:
+                raise ApiError(404, "Not found")
+            status, payload = 200, route()
+        except ApiError as exc:
+            status, payload = exc.status, {"error": exc.message}
+        except Exception:
+            # Anything else is a server fault; the client still gets an answer
+            traceback.print_exc()
+            status, payload = 500, {"error": "Internal server error"}
+        self._send_json(status, payload)
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] == "/metrics":
+            self._send_text(200, metrics.prometheus_text())
+            return
+        self._dispatch({
+            "/health": lambda: {"status": "ok"},
+            "/models": lambda: {"models": list(MODEL_PATHS)},
+            "/stats": lambda: {
+                "registry": get_registry().stats(),
+                "micro_batchers": batcher_stats(),
+                "prediction_cache": get_cache().stats(),
+                "model_versions": get_version_manager().stats(),
+            },
+        })
+
+    def do_POST(self):
+        try:
+            self._read_body()
+        except ApiError as exc:
+            self._send_json(exc.status, {"error": exc.message})
+            return
+        self._dispatch({
+            "/predict": self.predict,
+            "/predict_batch": self.predict_batch,
+        })
+
+    def _explain_options(self, payload):
+        if not payload.get("explain"):
+            return None
+        top_k, terms = payload.get("top_k", 3), payload.get("terms", 10)
+        if not all(isinstance(n, int) and not isinstance(n, bool) and 0 <= n <= 100 for n in (top_k, terms)):
+            raise ApiError(400, "'top_k' and 'terms' must be integers from 0 to 100")
+        return top_k, terms
+
+    def predict(self):
+        payload = self._read_json()
+        text = payload.get("text")
+        if not isinstance(text, str):
+            raise ApiError(400, "'text' must be a string")
+        model_name = self._model_name(payload)
+        options = self._explain_options(payload)
+        policy = self.server.input_policy
+        if not options and len(text) <= policy.max_chars and self.server.micro_batch_wait_ms > 0:
+            # The batcher's single thread already serializes this work, so
+            # waiting for it takes no prediction slot
+            batcher = get_batcher(model_name, self.server.micro_batch_size,
+                                  self.server.micro_batch_wait_ms)
+            return dict(batcher(text), model=model_name)
+        with self.server.prediction_slots:
+            if len(text) > policy.max_chars:
+                try:
+                    result, info = guarded_classify(text, model_name, policy, details=options)
+                except InputRejected as exc:
+                    raise ApiError(413, str(exc)) from None
+                except BudgetExceeded as exc:
+                    raise ApiError(504, str(exc)) from None
+                return dict(result, model=model_name, input=info)
+            if options:
+                results, seconds = routed_explain([text], model_name, *options)
+                return dict(results[0], model=model_name, seconds=seconds)
+            return dict(routed_classify([text], model_name)[0], model=model_name)
+
+    def predict_batch(self):
+        payload = self._read_json()
+        texts = payload.get("texts")
+        if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+            raise ApiError(400, "'texts' must be a list of strings")
+        if len(texts) > self.server.max_batch_size:
+            raise ApiError(413, "At most {} texts per batch".format(self.server.max_batch_size))
+        max_chars = self.server.input_policy.max_chars
+        if any(len(t) > max_chars for t in texts):
+            raise ApiError(413, "Batch texts are limited to {} characters; "
+                                "send longer texts to /predict".format(max_chars))
+        model_name = self._model_name(payload)
+        options = self._explain_options(payload)
+        if not texts:
+            return {"model": model_name, "predictions": []}
+        with self.server.prediction_slots:
+            if options:
+                predictions, seconds = routed_explain(texts, model_name, *options)
+                return {"model": model_name, "predictions": predictions, "seconds": seconds}
+            # The whole batch is vectorized and predicted in one call
+            return {"model": model_name, "predictions": routed_classify(texts, model_name)}
+
+
+def make_server(host="127.0.0.1", port=8000, workers=4, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                micro_batch_size=DEFAULT_MICRO_BATCH_SIZE,
+                micro_batch_wait_ms=DEFAULT_MICRO_BATCH_WAIT_MS,
+                max_connections=DEFAULT_MAX_CONNECTIONS):
+    """Create an API server; call ``serve_forever()`` to start it."""
+    return ApiHTTPServer((host, port), PredictionHandler,
+                         workers=workers, max_batch_size=max_batch_size,
+                         micro_batch_size=micro_batch_size,
+                         micro_batch_wait_ms=micro_batch_wait_ms,
+                         max_connections=max_connections)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the news classifier over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=4,
+                        help="unbatched prediction requests processed at once")
+    parser.add_argument("--max-connections", type=int, default=DEFAULT_MAX_CONNECTIONS,
+                        help="open client connections, idle keep-alive ones included")
+    parser.add_argument("--max-batch-size", type=int, default=DEFAULT_MAX_BATCH_SIZE)
+    parser.add_argument("--micro-batch-size", type=int, default=DEFAULT_MICRO_BATCH_SIZE,
+                        help="most /predict texts coalesced into one model call")
+    parser.add_argument("--micro-batch-wait-ms", type=float, default=DEFAULT_MICRO_BATCH_WAIT_MS,
+                        help="longest a /predict text waits for others (0 disables)")
+    parser.add_argument("--preload", action="store_true",
+                        help="load every model at startup instead of on first use")
+    args = parser.parse_args(argv)
+
+    if args.preload:
+        registry = get_registry()
+        registry.get_vectorizer()
+        for name in MODEL_PATHS:
+            registry.get_model(name)
+
+    server = make_server(args.host, args.port, args.workers, args.max_batch_size,
+                         args.micro_batch_size, args.micro_batch_wait_ms, args.max_connections)
+    print("Serving on http://{}:{} with {} workers".format(args.host, args.port, args.workers))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+    Input guard and chunked vectorization for very long articles.
+
+    Description: A pasted multi-megabyte article would otherwise go to the
+    vectorizer whole, at unbounded cost to the thread serving the request.
+    Texts longer than ``max_chars`` are handled according to the policy:
+
+        chunk     split into windows at whitespace, count terms window by
+                  window and apply the idf weighting and normalization once
+                  to the summed counts. The result is identical to
+                  vectorizing the whole text, but the work is done in
+                  bounded steps that respect the time budget. This only
+                  holds for a word unigram vectorizer with raw counts;
+                  any other vectorizer falls back to "truncate".
+        truncate  keep only the first ``max_chars`` characters.
+        reject    refuse the text.
+
+    Every guarded request also has a time budget. The work runs on a
+    background thread and the caller stops waiting once the budget is
+    spent, with an error instead of a blocked session. Chunked
+    vectorization checks the budget between windows and gives up early.
+
+    Configuration (environment variables):
+
+        CLASSIFIER_MAX_CHARS       longest text vectorized as is (default 100000)
+        CLASSIFIER_LONG_TEXT_POLICY  "chunk", "truncate" or "reject" (default chunk)
+        CLASSIFIER_WINDOW_CHARS    window size for chunked vectorization (default 50000)
+        CLASSIFIER_HARD_MAX_CHARS  text beyond this is truncated even when chunking (default 5000000)
+        CLASSIFIER_TIME_BUDGET     seconds allowed per request (default 5)
+
+"""
+import os
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+
+from inference import classify_all_matrix, classify_matrix, vectorize
+from metrics import metrics
+from model_registry import get_registry
+from model_versions import routed_classify, routed_explain, routed_score
+
+POLICIES = ("chunk", "truncate", "reject")
+
+# Guarded work runs here so the calling thread can stop waiting
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="guarded")
+
+# TF-IDF weighting of each loaded vectorizer, applied to summed counts
+_transformers = weakref.WeakKeyDictionary()
+
+
+class InputRejected(ValueError):
+    """Raised when a text is longer than the policy allows."""
+
+
+class BudgetExceeded(TimeoutError):
+    """Raised when a request does not finish within its time budget."""
+
+
+class InputPolicy:
+    """Limits applied to a single classification request."""
+
+    def __init__(self, max_chars=100000, mode="chunk", window_chars=50000,
+                 hard_max_chars=5000000, time_budget=5.0):
+        if mode not in POLICIES:
+            raise ValueError("Unknown long text policy: {}".format(mode))
+        self.max_chars = max_chars
+        self.mode = mode
+        self.window_chars = window_chars
+        self.hard_max_chars = hard_max_chars
+        self.time_budget = time_budget
+
+    @classmethod
+    def from_env(cls, environ=os.environ):
+        return cls(
+            max_chars=int(environ.get("CLASSIFIER_MAX_CHARS", 100000)),
+            mode=environ.get("CLASSIFIER_LONG_TEXT_POLICY", "chunk").lower(),
+            window_chars=int(environ.get("CLASSIFIER_WINDOW_CHARS", 50000)),
+            hard_max_chars=int(environ.get("CLASSIFIER_HARD_MAX_CHARS", 5000000)),
+            time_budget=float(environ.get("CLASSIFIER_TIME_BUDGET", 5)),
+        )
+
+
+def _cut(text, limit):
+    """Return ``text[:limit]``, moved back to the last whitespace if possible."""
+    if len(text) <= limit:
+        return text
+    space = max(text.rfind(" ", 0, limit + 1), text.rfind("\n", 0, limit + 1))
+    return text[:space] if space > 0 else text[:limit]
+
+
+def split_windows(text, window_chars):
+    """Split ``text`` into windows of at most ``window_chars`` characters.
+
+    Windows end at whitespace so that no token is cut in two.
+    """
+    windows = []
+    start = 0
+    while start < len(text):
+        end = start + window_chars
+        if end < len(text):
+            space = max(text.rfind(" ", start, end + 1), text.rfind("\n", start, end + 1))
+            if space > start:
+                end = space
+        windows.append(text[start:end])
+        start = end
+    return windows
+
+
+def can_chunk(vectorizer):
+    """Return True if window-by-window counts add up to the whole-text counts.
+
+    That needs single words from the built-in tokenizer (no term crosses a
+    window boundary) and raw counts (binary ones cannot be summed).
+    """
+    return (vectorizer.analyzer == "word" and tuple(vectorizer.ngram_range) == (1, 1)
+            and vectorizer.tokenizer is None and not vectorizer.binary)
+
+
+def _tfidf_transformer(vectorizer):
+    transformer = _transformers.get(vectorizer)
+    if transformer is None:
+        transformer = TfidfTransformer(norm=vectorizer.norm, use_idf=vectorizer.use_idf,
+                                       smooth_idf=vectorizer.smooth_idf,
+                                       sublinear_tf=vectorizer.sublinear_tf)
+        if vectorizer.use_idf:
+            transformer.idf_ = vectorizer.idf_
+        _transformers[vectorizer] = transformer
+    return transformer
+
+
+def chunked_transform(vectorizer, text, window_chars, deadline=None):
+    """Vectorize one long text window by window into a single TF-IDF row.
+
+    Raises ValueError for a vectorizer ``can_chunk`` refuses.
+    """
+    if not can_chunk(vectorizer):
+        raise ValueError("Only word unigram vectorizers with raw counts can be chunked")
+    counts = None
+    for window in split_windows(text, window_chars):
+        if deadline is not None and time.monotonic() > deadline:
+            raise BudgetExceeded("Time budget exhausted while vectorizing")
+        # The count stage of the TF-IDF vectorizer, without idf or norm
+        window_counts = CountVectorizer.transform(vectorizer, [window])
+        counts = window_counts if counts is None else counts + window_counts
+    if counts is None:
+        counts = sp.csr_matrix((1, len(vectorizer.vocabulary_)))
+    return _tfidf_transformer(vectorizer).transform(counts).tocsr()
+
+
+def long_text_mode(policy, vectorizer):
+    """Return the policy's mode, with "chunk" replaced by "truncate" when
+    ``vectorizer`` cannot be chunked exactly."""
+    if policy.mode == "chunk" and not can_chunk(vectorizer):
+        return "truncate"
+    return policy.mode
+
+
+def check_input(text, policy, registry=None):
+    """Return how ``text`` will be handled under ``policy``.
+
+    Raises InputRejected when the policy refuses it.
+    """
+    info = {"chars": len(text), "mode": "full", "windows": 1, "truncated_to": None}
+    if len(text) > policy.max_chars:
+        mode = long_text_mode(policy, (registry or get_registry()).get_vectorizer())
+        if mode == "reject":
+            raise InputRejected("Text is {:,} characters; the limit is {:,}".format(
+                len(text), policy.max_chars))
+        if mode == "truncate":
+            info.update(mode="truncate", truncated_to=len(_cut(text, policy.max_chars)))
+        else:
+            kept = _cut(text, policy.hard_max_chars)
+            info.update(mode="chunk", windows=len(split_windows(kept, policy.window_chars)))
+            if len(kept) < len(text):
+                info["truncated_to"] = len(kept)
+    return info
+
+
+def run_guarded(text, model_name, policy, deadline=None, registry=None, details=None):
+    """Classify ``text`` under ``policy`` on the calling thread.
+
+    ``deadline`` (a ``time.monotonic()`` value) is checked between windows
+    of a chunked transform. Returns ``(result, stages)``; ``stages`` is None
+    unless ``details`` is given. ``guarded_classify`` adds the time budget.
+    """
+    registry = registry or get_registry()
+    if len(text) <= policy.max_chars:
+        if details:
+            results, seconds = routed_explain([text], model_name, *details)
+            return results[0], seconds
+        return routed_classify([text], model_name)[0], None
+
+    start = time.perf_counter()
+    X = guarded_transform(text, policy, deadline, registry)
+    transform = time.perf_counter() - start
+    results, seconds = routed_score(X, model_name, details)
+    return results[0], dict(seconds, transform=transform) if seconds else None
+
+
+def guarded_transform(text, policy, deadline=None, registry=None):
+    """Vectorize one text into a TF-IDF row, chunked or truncated as ``policy`` says.
+
+    The policy should already have been checked with ``check_input``.
+    """
+    vectorizer = (registry or get_registry()).get_vectorizer()
+    if len(text) <= policy.max_chars:
+        return vectorize(vectorizer, [text])
+    if long_text_mode(policy, vectorizer) != "chunk":
+        return vectorize(vectorizer, [_cut(text, policy.max_chars)])
+    with metrics.timed("transform_chunked", type(vectorizer).__name__):
+        return chunked_transform(vectorizer, _cut(text, policy.hard_max_chars),
+                                 policy.window_chars, deadline)
+
+
+def run_ensemble(text, policy, deadline=None, registry=None):
+    """Score ``text`` with every model (see ``inference.classify_all``) under ``policy``."""
+    start = time.perf_counter()
+    X = guarded_transform(text, policy, deadline, registry)
+    vectorize_seconds = time.perf_counter() - start
+    return dict(classify_all_matrix(X, registry), vectorize_seconds=vectorize_seconds)
+
+
+def run_served(text, model_name, policy, deadline=None, registry=None):
+    """Classify ``text`` under ``policy`` with the served model.
+
+    Unlike ``run_guarded`` this skips version routing and the prediction
+    cache, so every call does the full work (e.g. for profiling).
+    """
+    X = guarded_transform(text, policy, deadline, registry)
+    return classify_matrix(X, model_name, registry)[0]
+
+
+def guarded_classify(text, model_name, policy=None, registry=None, details=None):
+    """Classify one text within the policy's size limits and time budget.
+
+    Returns ``(result, info)`` where ``info`` describes how the input was
+    handled. With ``details=(top_k, n_terms)`` the result also carries the
+    top-k categories and key terms (see ``inference.explain``) and
+    ``info["stages"]`` the time spent in each step. Raises InputRejected or
+    BudgetExceeded.
+    """
+    policy = policy or InputPolicy.from_env()
+    info = check_input(text, policy, registry)
+    start = time.monotonic()
+    deadline = start + policy.time_budget if policy.time_budget else None
+    future = _executor.submit(run_guarded, text, model_name, policy, deadline, registry, details)
+    try:
+        result, stages = future.result(timeout=policy.time_budget or None)
+    except FutureTimeout:
+        future.cancel()
+        raise BudgetExceeded("Classification did not finish within {:.1f} s".format(
+            policy.time_budget)) from None
+    info["seconds"] = time.monotonic() - start
+    if stages:
+        info["stages"] = stages
+    return result, info
@@ -0,0 +1,226 @@
+"""
+    Dataset insights computed directly from a news CSV.
+
+    Description: Replaces the pre-rendered word clouds and charts on the
+    Insights page with statistics computed from a CSV shaped like test.csv:
+    the category distribution, text-length statistics and histograms per
+    text column, and the top TF-IDF terms per category.
+
+    Every statistic is an additive aggregate (counts, sums, sums of squares,
+    per-category TF-IDF sums), so results are cached on disk next to the
+    SHA-256 of the bytes they were computed from. When the file is
+    unchanged the cache is returned as is, when rows were only appended just
+    the new rows are processed and merged in, and anything else triggers a
+    full recomputation.
+
+"""
+import hashlib
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from model_registry import BASE_DIR, get_registry
+
+CACHE_DIR = os.environ.get("INSIGHTS_CACHE_DIR", os.path.join(BASE_DIR, ".insights_cache"))
+CATEGORY_COLUMN = "category"
+TERMS_COLUMN = "content"
+CHUNK_SIZE = 2000
+
+# Fixed histogram edges (in characters) so partial results can be added up;
+# a final bin collects everything longer
+LENGTH_BINS = {
+    "headlines": list(range(0, 301, 10)),
+    "description": list(range(0, 1001, 25)),
+    "content": list(range(0, 10001, 250)),
+}
+
+
+def _empty_stats(vocabulary):
+    return {
+        "rows": 0,
+        "categories": {},
+        "lengths": {
+            column: {"count": {}, "sum": {}, "sumsq": {}, "min": {}, "max": {},
+                     "histogram": [0] * len(edges)}
+            for column, edges in LENGTH_BINS.items()
+        },
+        "vocabulary": vocabulary,
+        "tfidf_sums": {},
+    }
+
+
+def _add(target, key, value, combine=lambda a, b: a + b):
+    target[key] = combine(target[key], value) if key in target else value
+
+
+def _accumulate(stats, chunk, vectorizer):
+    """Add the aggregates of one DataFrame chunk into ``stats`` in place."""
+    categories = chunk[CATEGORY_COLUMN].fillna("unknown").astype(str).str.strip().str.lower()
+    stats["rows"] += len(chunk)
+    for category, count in categories.value_counts().items():
+        _add(stats["categories"], category, int(count))
+
+    for column, edges in LENGTH_BINS.items():
+        if column not in chunk.columns:
+            continue
+        lengths = chunk[column].fillna("").astype(str).str.len()
+        grouped = lengths.groupby(categories).agg(["count", "sum", "min", "max"])
+        grouped["sumsq"] = (lengths.astype(float) ** 2).groupby(categories).sum()
+        column_stats = stats["lengths"][column]
+        for category, row in grouped.iterrows():
+            _add(column_stats["count"], category, int(row["count"]))
+            _add(column_stats["sum"], category, float(row["sum"]))
+            _add(column_stats["sumsq"], category, float(row["sumsq"]))
+            _add(column_stats["min"], category, int(row["min"]), min)
+            _add(column_stats["max"], category, int(row["max"]), max)
+        bins = np.searchsorted(edges, lengths.to_numpy(), side="right") - 1
+        counts = np.bincount(bins, minlength=len(edges))
+        column_stats["histogram"] = (np.asarray(column_stats["histogram"]) + counts).tolist()
+
+    if TERMS_COLUMN in chunk.columns:
+        X = vectorizer.transform(chunk[TERMS_COLUMN].fillna("").astype(str))
+        codes, names = pd.factorize(categories)
+        # One sparse product sums the TF-IDF rows of every category at once
+        indicator = sp.csr_matrix((np.ones(len(codes)), (codes, np.arange(len(codes)))),
+                                  shape=(len(names), len(codes)))
+        sums = np.asarray((indicator @ X).todense())
+        for name, row in zip(names, sums):
+            _add(stats["tfidf_sums"], name, row.tolist(),
+                 lambda a, b: (np.asarray(a) + np.asarray(b)).tolist())
+
+
+def _process(stats, stream, vectorizer):
+    with pd.read_csv(stream, chunksize=CHUNK_SIZE) as reader:
+        for chunk in reader:
+            if CATEGORY_COLUMN not in chunk.columns:
+                raise ValueError("Input has no '{}' column".format(CATEGORY_COLUMN))
+            if len(chunk):
+                _accumulate(stats, chunk, vectorizer)
+    return stats
+
+
+def _hash_prefix(path, size, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        remaining = size
+        while remaining:
+            block = f.read(min(chunk_size, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+
+def _cache_path(path):
+    name = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, name + ".json")
+
+
+def _load_cache(path):
+    try:
+        with open(_cache_path(path), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_cache(path, cached):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = _cache_path(path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cached, f)
+    os.replace(tmp, _cache_path(path))
+
+
+def compute_insights(path, registry=None):
+    """Return ``(stats, mode)`` for the CSV at ``path``.
+
+    ``mode`` is "cached", "incremental" or "full" depending on how much of
+    the file had to be processed.
+    """
+    registry = registry or get_registry()
+    vectorizer = registry.get_vectorizer()
+    vocabulary = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    vectorizer_hash = registry.stats()["artifacts"][registry.vectorizer_path]["sha256"]
+    size = os.path.getsize(path)
+
+    cached = _load_cache(path)
+    usable = (cached is not None and cached["vectorizer_sha256"] == vectorizer_hash
+              and cached["size"] <= size and cached["ends_with_newline"]
+              and _hash_prefix(path, cached["size"]) == cached["sha256"])
+
+    if usable and cached["size"] == size:
+        return cached["stats"], "cached"
+
+    if usable:
+        # Only parse the appended rows, behind the original header line
+        with open(path, "rb") as f:
+            header = f.readline()
+            f.seek(cached["size"])
+            tail = f.read()
+        stats = _process(cached["stats"], io.BytesIO(header + tail), vectorizer)
+        mode = "incremental"
+    else:
+        stats = _process(_empty_stats(vocabulary), path, vectorizer)
+        mode = "full"
+
+    with open(path, "rb") as f:
+        f.seek(max(size - 1, 0))
+        ends_with_newline = f.read(1) in (b"\n", b"")
+    _save_cache(path, {
+        "size": size,
+        "sha256": _hash_prefix(path, size),
+        "ends_with_newline": ends_with_newline,
+        "vectorizer_sha256": vectorizer_hash,
+        "stats": stats,
+    })
+    return stats, mode
+
+
+def category_distribution(stats):
+    """Return the number of rows per category, largest first."""
+    return pd.Series(stats["categories"], name="articles").sort_values(ascending=False)
+
+
+def length_summary(stats, column):
+    """Return count/mean/std/min/max of a column's text length per category."""
+    lengths = stats["lengths"][column]
+    frame = pd.DataFrame({key: pd.Series(lengths[key]) for key in ("count", "sum", "sumsq", "min", "max")})
+    if frame.empty:
+        return frame
+    mean = frame["sum"] / frame["count"]
+    variance = (frame["sumsq"] / frame["count"] - mean ** 2).clip(lower=0)
+    return pd.DataFrame({
+        "count": frame["count"],
+        "mean": mean.round(1),
+        "std": np.sqrt(variance).round(1),
+        "min": frame["min"],
+        "max": frame["max"],
+    })
+
+
+def length_histogram(stats, column):
+    """Return the histogram of a column's text lengths, indexed by bin."""
+    edges = LENGTH_BINS[column]
+    labels = ["{}-{}".format(lo, hi - 1) for lo, hi in zip(edges, edges[1:])]
+    labels.append("{}+".format(edges[-1]))
+    return pd.Series(stats["lengths"][column]["histogram"], index=labels, name="articles")
+
+
+def top_terms(stats, category, n=20):
+    """Return the ``n`` terms with the highest mean TF-IDF in ``category``.
+
+    Raises KeyError when no terms were counted for ``category``, which is
+    the case for every category of a file without a content column.
+    """
+    if category not in stats["tfidf_sums"]:
+        raise KeyError("No term statistics for category: {}".format(category))
+    sums = np.asarray(stats["tfidf_sums"][category])
+    means = sums / max(stats["categories"].get(category, 0), 1)
+    order = np.argsort(means)[::-1][:n]
+    return pd.Series(means[order], index=[stats["vocabulary"][i] for i in order], name="mean TF-IDF")
@@ -0,0 +1,169 @@
+"""
+    Streaming JSONL inference for request logs.
+
+    Description: A chain of generators reads JSONL records lazily, pulls out
+    their text fields, classifies them in bounded-size batches and writes
+    each record back out annotated with its prediction. Nothing is read
+    before the writer asks for it, so a slow consumer (for example a pipe
+    to another process) holds the reader back and memory stays bounded by
+    the batch size, whatever the size of the log.
+
+    Every output record carries the byte offset just past its input line.
+    With --checkpoint, the offset reached after each flushed batch is also
+    saved, and --resume restarts from there.
+
+    Usage:
+
+        python jsonl_pipeline.py requests.jsonl -o annotated.jsonl --checkpoint run.offset
+        python jsonl_pipeline.py requests.jsonl -o annotated.jsonl --checkpoint run.offset --resume
+        python jsonl_pipeline.py big.jsonl --start-offset 1048576 | gzip > annotated.jsonl.gz
+
+"""
+import argparse
+import json
+import os
+import sys
+
+from model_registry import MODEL_PATHS
+from prediction_cache import cached_classify
+
+TEXT_FIELDS = ("headlines", "description", "content")
+DEFAULT_BATCH_SIZE = 256
+OFFSET_FIELD = "_offset"
+ERROR_FIELD = "_error"
+
+
+def read_records(path, start_offset=0):
+    """Yield ``(end_offset, record)`` for each line from ``start_offset`` on.
+
+    Lines that are not valid JSON objects are yielded as ``None`` records so
+    the caller can report them without stopping the stream.
+    """
+    with open(path, "rb") as f:
+        f.seek(start_offset)
+        offset = start_offset
+        for line in f:
+            offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield offset, record if isinstance(record, dict) else None
+
+
+def extract_text(record, fields=TEXT_FIELDS):
+    """Join the non-empty text fields of ``record``."""
+    parts = (record.get(field) for field in fields)
+    return "\n".join(str(part) for part in parts if part)
+
+
+def batched(items, size):
+    """Group an iterable into lists of at most ``size`` items."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def annotate(batches, model_name, fields=TEXT_FIELDS):
+    """Classify each batch of ``(offset, record)`` pairs with one model call.
+
+    Yields ``(end_offset, records)`` with every record annotated.
+    """
+    for batch in batches:
+        valid = [(offset, record) for offset, record in batch if record is not None]
+        results = cached_classify([extract_text(r, fields) for _, r in valid], model_name) if valid else []
+        results = iter(results)
+        annotated = []
+        for offset, record in batch:
+            if record is None:
+                annotated.append({OFFSET_FIELD: offset, ERROR_FIELD: "invalid JSON object"})
+                continue
+            result = next(results)
+            record = dict(record)
+            record["predicted_category"] = result["category"]
+            record["confidence"] = max(result["probabilities"].values())
+            record["model"] = model_name
+            record[OFFSET_FIELD] = offset
+            annotated.append(record)
+        yield batch[-1][0], annotated
+
+
+def run_pipeline(path, out, model_name, batch_size=DEFAULT_BATCH_SIZE, start_offset=0,
+                 fields=TEXT_FIELDS, on_batch=None):
+    """Stream ``path`` through the classifier into the text file ``out``.
+
+    ``on_batch`` is called with the input offset reached after each batch
+    has been written and flushed. Returns ``(records, end_offset)``.
+    """
+    records = 0
+    offset = start_offset
+    batches = annotate(batched(read_records(path, start_offset), batch_size), model_name, fields)
+    for offset, annotated in batches:
+        out.write("".join(json.dumps(record) + "\n" for record in annotated))
+        out.flush()
+        records += len(annotated)
+        if on_batch is not None:
+            on_batch(offset)
+    return records, offset
+
+
+def _save_checkpoint(path, offset):
+    # Write then rename so a crash never leaves a truncated checkpoint
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(str(offset))
+    os.replace(tmp, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classify a JSONL log as a stream.")
+    parser.add_argument("input", help="JSONL file")
+    parser.add_argument("-o", "--output", help="output JSONL (default: stdout)")
+    parser.add_argument("-m", "--model", default="Logistic Regression", choices=list(MODEL_PATHS))
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--fields", nargs="+", default=list(TEXT_FIELDS),
+                        help="record fields joined into the text to classify")
+    parser.add_argument("--start-offset", type=int, default=0, help="byte offset to start reading at")
+    parser.add_argument("--checkpoint", help="file recording the offset reached after each batch")
+    parser.add_argument("--resume", action="store_true", help="start from the offset in --checkpoint")
+    args = parser.parse_args(argv)
+
+    start = args.start_offset
+    if args.resume:
+        if not args.checkpoint:
+            parser.error("--resume requires --checkpoint")
+        if os.path.exists(args.checkpoint):
+            with open(args.checkpoint) as f:
+                start = int(f.read().strip() or 0)
+
+    on_batch = None
+    if args.checkpoint:
+        on_batch = lambda offset: _save_checkpoint(args.checkpoint, offset)
+
+    # Resuming appends to the existing output instead of overwriting it
+    mode = "a" if args.resume else "w"
+    out = open(args.output, mode, encoding="utf-8") if args.output else sys.stdout
+    try:
+        records, offset = run_pipeline(args.input, out, args.model, args.batch_size,
+                                       start, args.fields, on_batch)
+    except BrokenPipeError:
+        # The downstream consumer went away; the checkpoint marks our progress.
+        # Point stdout at devnull so the interpreter's final flush stays quiet.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print("Annotated {} records, stopped at byte offset {}".format(records, offset), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
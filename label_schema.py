@@ -0,0 +1,120 @@
+"""
+    Label schema stored next to each model artifact.
+
+    Description: Every ``<model>.pkl`` has a ``<model>.labels.json`` sidecar
+    manifest listing the estimator's ``classes_`` and the category name for
+    each of them, in the same order as the columns of ``predict_proba``.
+    The manifest is checked against the estimator when the model is loaded,
+    and whole batches of predictions are decoded with one array lookup.
+
+    Write or refresh a manifest with:
+
+        python label_schema.py mlr_model.pkl Business Education Entertainment Sport Technology
+
+"""
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+
+UNKNOWN_LABEL = "Unknown"
+
+
+class LabelSchemaError(ValueError):
+    """Raised when a manifest does not match the estimator it describes."""
+
+
+def manifest_path(model_path):
+    """Return the sidecar manifest location for a model artifact."""
+    return os.path.splitext(model_path)[0] + ".labels.json"
+
+
+class LabelSchema:
+    """Maps an estimator's class codes to category names."""
+
+    def __init__(self, classes, labels):
+        classes = np.asarray(classes)
+        if len(classes) != len(labels):
+            raise LabelSchemaError("{} classes but {} labels".format(len(classes), len(labels)))
+        if len(set(labels)) != len(labels):
+            raise LabelSchemaError("Duplicate labels: {}".format(list(labels)))
+        order = np.argsort(classes, kind="stable")
+        if len(classes) and (np.diff(classes[order]) == 0).any():
+            raise LabelSchemaError("Duplicate classes: {}".format(classes.tolist()))
+        self.classes = classes
+        # Category names in the estimator's class (predict_proba column) order
+        self.labels = np.asarray(labels, dtype=object)
+        self._sorted_classes = classes[order]
+        self._sorted_labels = np.append(self.labels[order], UNKNOWN_LABEL)
+
+    @property
+    def digest(self):
+        """Short hash identifying this class -> label mapping."""
+        content = json.dumps([self.classes.tolist(), self.labels.tolist()])
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+    @classmethod
+    def load(cls, path):
+        """Read a schema from a JSON manifest."""
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        return cls(manifest["classes"], manifest["labels"])
+
+    @classmethod
+    def for_estimator(cls, estimator, model_path):
+        """Return the schema for ``estimator``, validated against its ``classes_``.
+
+        Uses the sidecar manifest when there is one. Estimators trained on
+        string targets need no manifest: their classes are the labels.
+        """
+        path = manifest_path(model_path)
+        classes = np.asarray(estimator.classes_)
+        if os.path.exists(path):
+            schema = cls.load(path)
+            if schema.classes.shape != classes.shape or not (schema.classes == classes).all():
+                raise LabelSchemaError(
+                    "{} lists classes {} but the model has {}".format(
+                        os.path.basename(path), schema.classes.tolist(), classes.tolist()))
+            return schema
+        if classes.dtype.kind in "OUS":
+            return cls(classes, [str(c) for c in classes])
+        raise LabelSchemaError("No label manifest for {}".format(os.path.basename(model_path)))
+
+    def decode(self, codes):
+        """Map an array of class codes to category names in one lookup."""
+        codes = np.asarray(codes)
+        if not len(self._sorted_classes):
+            return np.full(codes.shape, UNKNOWN_LABEL, dtype=object)
+        index = np.searchsorted(self._sorted_classes, codes)
+        clipped = np.minimum(index, len(self._sorted_classes) - 1)
+        # Codes not in the schema decode to "Unknown"
+        index = np.where(self._sorted_classes[clipped] == codes, index, len(self._sorted_classes))
+        return self._sorted_labels[index]
+
+    def save(self, path):
+        """Write the schema as a JSON manifest."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"classes": self.classes.tolist(), "labels": self.labels.tolist()}, f, indent=2)
+            f.write("\n")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) < 2:
+        print("Usage: python label_schema.py MODEL.pkl LABEL [LABEL ...]", file=sys.stderr)
+        return 2
+    # Imported here so that loading a schema never pulls in joblib
+    import joblib
+
+    model_path, labels = argv[0], argv[1:]
+    estimator = joblib.load(model_path)
+    schema = LabelSchema(estimator.classes_, labels)
+    schema.save(manifest_path(model_path))
+    print("Wrote {}".format(manifest_path(model_path)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
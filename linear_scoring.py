@@ -0,0 +1,195 @@
+"""
+    Lightweight NumPy scoring engine for the linear models.
+
+    Description: Logistic Regression and Multinomial Naive Bayes predictions
+    are a sparse-dense matrix product followed by an argmax (and a softmax
+    for probabilities). LinearScorer holds just those parameters, pulled out
+    of the fitted estimators (``coef_``/``intercept_`` and
+    ``feature_log_prob_``/``class_log_prior_``), and scores CSR batches
+    directly, skipping scikit-learn's per-call validation and dispatch.
+    Results match the estimators' ``predict`` and ``predict_proba``.
+
+    Check parity against the pickled models with:
+
+        python linear_scoring.py check test.csv
+
+"""
+import sys
+import weakref
+
+import numpy as np
+
+
+def softmax(scores):
+    """Row-wise softmax, computed in place on a float array."""
+    scores -= scores.max(axis=1, keepdims=True)
+    np.exp(scores, out=scores)
+    scores /= scores.sum(axis=1, keepdims=True)
+    return scores
+
+
+def _expit(scores):
+    return 1.0 / (1.0 + np.exp(-scores))
+
+
+class LinearScorer:
+    """Scores feature rows as ``X @ weights + bias``.
+
+    ``weights`` is stored feature-major, shape ``(n_features, n_classes)``,
+    and ``X`` may be a SciPy sparse matrix, a dense array or any object
+    implementing ``@`` with such an array.
+    """
+
+    KINDS = ("logistic", "multinomial_nb")
+
+    def __init__(self, kind, weights, bias, classes, multi_class="multinomial"):
+        if kind not in self.KINDS:
+            raise ValueError("Unknown linear model kind: {}".format(kind))
+        self.kind = kind
+        self.multi_class = multi_class
+        self.weights = weights
+        self.bias = bias
+        self.classes_ = np.asarray(classes)
+
+    @classmethod
+    def supports(cls, estimator):
+        """Return True if ``estimator`` can be scored by a LinearScorer."""
+        return type(estimator).__name__ in ("LogisticRegression", "MultinomialNB")
+
+    @classmethod
+    def from_estimator(cls, estimator):
+        """Extract the scoring parameters from a fitted estimator."""
+        kind = type(estimator).__name__
+        if kind == "LogisticRegression":
+            multi_class = getattr(estimator, "multi_class", "auto")
+            # scikit-learn 1.5 deprecated the parameter; its new default
+            # "deprecated" behaves like "auto"
+            if multi_class in ("auto", "deprecated"):
+                # scikit-learn picks multinomial for lbfgs and other solvers
+                # that support it, and ovr for liblinear
+                multi_class = "ovr" if estimator.solver == "liblinear" else "multinomial"
+            return cls("logistic", _feature_major(estimator.coef_),
+                       np.asarray(estimator.intercept_, dtype=np.float64),
+                       estimator.classes_, multi_class)
+        if kind == "MultinomialNB":
+            return cls("multinomial_nb", _feature_major(estimator.feature_log_prob_),
+                       np.asarray(estimator.class_log_prior_, dtype=np.float64),
+                       estimator.classes_)
+        raise TypeError("{} is not a supported linear model".format(kind))
+
+    def decision_function(self, X):
+        """Return the raw class scores (or joint log-likelihoods)."""
+        return np.asarray(X @ self.weights) + self.bias
+
+    def predict_proba(self, X):
+        scores = self.decision_function(X)
+        if scores.shape[1] == 1:
+            positive = _expit(scores[:, 0])
+            return np.column_stack([1.0 - positive, positive])
+        if self.kind == "logistic" and self.multi_class == "ovr":
+            scores = _expit(scores)
+            return scores / scores.sum(axis=1, keepdims=True)
+        return softmax(scores)
+
+    def predict(self, X):
+        scores = self.decision_function(X)
+        if scores.shape[1] == 1:
+            return self.classes_[(scores[:, 0] > 0).astype(int)]
+        return self.classes_[scores.argmax(axis=1)]
+
+    def top_contributions(self, X, columns, n=10):
+        """Return the ``n`` features that most favour a class in each row.
+
+        ``X`` is a CSR matrix (anything with ``indptr``, ``indices`` and
+        ``data``) and ``columns`` gives, per row, the class column to
+        explain. A feature's contribution is its value times the amount by
+        which its weight for that class exceeds its mean weight over all
+        classes, i.e. how far it moves the class score ahead of the others.
+        Only positive contributions are kept. Returns ``(indptr, indices,
+        contributions)`` in CSR layout, strongest first within each row.
+        """
+        counts = np.diff(X.indptr)
+        rows = np.repeat(np.arange(len(counts)), counts)
+        contributions = X.data * self._relative_weights()[X.indices, np.asarray(columns)[rows]]
+        # Rows stay in order; within a row the largest contributions come first
+        order = np.lexsort((-contributions, rows))
+        rank = np.arange(len(order)) - X.indptr[rows]
+        keep = order[(rank < n) & (contributions[order] > 0)]
+        indptr = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows[keep], minlength=len(counts)), out=indptr[1:])
+        return indptr, np.asarray(X.indices)[keep], contributions[keep]
+
+    def _relative_weights(self):
+        relative = getattr(self, "_relative", None)
+        if relative is None:
+            if self.weights.shape[1] == 1:
+                # Binary models score the positive class only
+                relative = np.column_stack([-self.weights[:, 0], self.weights[:, 0]])
+            else:
+                relative = self.weights - self.weights.mean(axis=1, keepdims=True)
+            self._relative = relative
+        return relative
+
+
+def _feature_major(weights):
+    return np.ascontiguousarray(np.asarray(weights, dtype=np.float64).T)
+
+
+# One scorer per loaded estimator; dropped when the estimator is reloaded
+_scorers = weakref.WeakKeyDictionary()
+
+
+def scorer_for(estimator):
+    """Return the cached LinearScorer for ``estimator``, or None if unsupported."""
+    if not LinearScorer.supports(estimator):
+        return None
+    scorer = _scorers.get(estimator)
+    if scorer is None:
+        scorer = _scorers[estimator] = LinearScorer.from_estimator(estimator)
+    return scorer
+
+
+def check_parity(data, text_column="content"):
+    """Compare LinearScorer with the estimators on a CSV file."""
+    import time
+
+    import pandas as pd
+
+    from model_registry import MODEL_PATHS, get_registry
+
+    registry = get_registry()
+    texts = pd.read_csv(data)[text_column].fillna("").astype(str).tolist()
+    X = registry.get_vectorizer().transform(texts).tocsr()
+    single = X[:1]
+    ok = True
+    for name in MODEL_PATHS:
+        estimator = registry.get_model(name)
+        if not LinearScorer.supports(estimator):
+            continue
+        scorer = LinearScorer.from_estimator(estimator)
+        same_labels = (scorer.predict(X) == estimator.predict(X)).mean()
+        max_error = np.abs(scorer.predict_proba(X) - estimator.predict_proba(X)).max()
+
+        timings = []
+        for fn in (estimator.predict_proba, scorer.predict_proba):
+            start = time.perf_counter()
+            for _ in range(200):
+                fn(single)
+            timings.append((time.perf_counter() - start) / 200 * 1e6)
+        print("{:<22} label agreement {:.4%}  max |proba diff| {:.2e}  "
+              "single-row predict_proba {:.0f} us -> {:.0f} us".format(
+                  name, same_labels, max_error, *timings))
+        ok = ok and same_labels == 1.0 and max_error < 1e-9
+    return ok
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) == 2 and argv[0] == "check":
+        return 0 if check_parity(argv[1]) else 1
+    print("Usage: python linear_scoring.py check DATA.csv", file=sys.stderr)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
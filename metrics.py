@@ -0,0 +1,150 @@
+"""
+    Per-stage latency instrumentation.
+
+    Description: The inference path records how long each stage takes into
+    fixed-bucket histograms, one per (stage, model) pair:
+
+        disk_read   reading an artifact file            (model = artifact file)
+        unpickle    deserializing an artifact           (model = artifact file)
+        transform   TF-IDF vectorization                (model = vectorizer class)
+        transform_chunked  windowed vectorization of a long text (model = vectorizer class)
+        densify     sparse -> dense conversion          (model = estimator class)
+        predict     predict / predict_proba             (model = estimator class)
+        explain     top-k and key terms in explain()    (model = display name)
+        classify    a whole classify() call             (model = display name)
+
+    The histograms are shown on the app's Performance page and exported in
+    the Prometheus text format by the HTTP API's /metrics endpoint.
+
+"""
+import cProfile
+import io
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds, as used by Prometheus client libraries
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """Estimate the ``q`` quantile by interpolating inside its bucket."""
+        if not self.count:
+            return 0.0
+        return min(max(self._interpolate(q), self.min), self.max)
+
+    def _interpolate(self, q):
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, self.counts):
+            if count and seen + count >= rank:
+                if bound == float("inf"):
+                    return lower
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return lower
+
+
+class Metrics:
+    """Thread-safe collection of stage histograms."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds, model=""):
+        with self._lock:
+            histogram = self._histograms.get((stage, model))
+            if histogram is None:
+                histogram = self._histograms[(stage, model)] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timed(self, stage, model=""):
+        """Time the enclosed block as one observation of ``stage``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, model)
+
+    def summary(self):
+        """Return one row of summary statistics per (stage, model)."""
+        with self._lock:
+            items = sorted(self._histograms.items())
+            return [{
+                "stage": stage,
+                "model": model,
+                "count": histogram.count,
+                "mean_ms": histogram.sum / histogram.count * 1000.0,
+                "p50_ms": histogram.quantile(0.5) * 1000.0,
+                "p95_ms": histogram.quantile(0.95) * 1000.0,
+                "p99_ms": histogram.quantile(0.99) * 1000.0,
+                "max_ms": histogram.max * 1000.0,
+                "total_s": histogram.sum,
+            } for (stage, model), histogram in items if histogram.count]
+
+    def prometheus_text(self, name="classifier_stage_seconds"):
+        """Render every histogram in the Prometheus text exposition format."""
+        lines = [
+            "# HELP {} Time spent in each inference stage.".format(name),
+            "# TYPE {} histogram".format(name),
+        ]
+        with self._lock:
+            for (stage, model), histogram in sorted(self._histograms.items()):
+                labels = 'stage="{}",model="{}"'.format(_escape(stage), _escape(model))
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append('{}_bucket{{{},le="{}"}} {}'.format(name, labels, le, cumulative))
+                lines.append("{}_sum{{{}}} {!r}".format(name, labels, histogram.sum))
+                lines.append("{}_count{{{}}} {}".format(name, labels, histogram.count))
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def profile_call(fn, *args, limit=25, **kwargs):
+    """Run ``fn`` under cProfile and return ``(result, report_text)``."""
+    profiler = cProfile.Profile()
+    result = profiler.runcall(fn, *args, **kwargs)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+    return result, out.getvalue()
+
+
+# Shared by every module in the process
+metrics = Metrics()
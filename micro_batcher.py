@@ -0,0 +1,157 @@
+"""
+    Micro-batching of concurrent single-text classification requests.
+
+    Description: Callers submit one text at a time. A background thread
+    collects submissions until either ``max_batch_size`` texts are waiting
+    or ``max_wait_ms`` has passed since the first one arrived, runs a single
+    batched transform and predict, and hands every caller its own result.
+
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import partial
+
+from model_versions import routed_classify
+
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_MAX_WAIT_MS = 5.0
+
+
+class MicroBatcher:
+    """Coalesces single submissions into batched calls of ``batch_fn``.
+
+    ``batch_fn`` receives a list of items and must return one result per
+    item, in the same order.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms=DEFAULT_MAX_WAIT_MS, name="micro-batcher"):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._histogram = {}
+        self._batches = 0
+        self._items = 0
+        self._max_queue_depth = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """Queue ``item`` and return a Future for its result."""
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        future = Future()
+        self._queue.put((item, future))
+        depth = self._queue.qsize()
+        if depth > self._max_queue_depth:
+            with self._stats_lock:
+                self._max_queue_depth = max(self._max_queue_depth, depth)
+        return future
+
+    def __call__(self, item, timeout=None):
+        """Submit ``item`` and block until its result is ready."""
+        return self.submit(item).result(timeout)
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Finish this batch, then stop
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            batch = [(item, future) for item, future in batch
+                     if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            self._record(len(batch))
+            try:
+                results = self.batch_fn([item for item, _ in batch])
+            except Exception as exc:
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def _record(self, size):
+        # Power-of-two buckets: 1, 2, 4, 8, ...
+        bucket = 1 << (size - 1).bit_length()
+        with self._stats_lock:
+            self._histogram[bucket] = self._histogram.get(bucket, 0) + 1
+            self._batches += 1
+            self._items += size
+
+    def stats(self):
+        """Return queue depth and batch-size statistics."""
+        with self._stats_lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_queue_depth,
+                "batches": self._batches,
+                "items": self._items,
+                "mean_batch_size": self._items / self._batches if self._batches else 0.0,
+                "batch_size_histogram": {
+                    "<={}".format(bucket): count
+                    for bucket, count in sorted(self._histogram.items())
+                },
+            }
+
+    def close(self):
+        """Stop accepting work and finish everything already queued."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(model_name, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                max_wait_ms=DEFAULT_MAX_WAIT_MS):
+    """Return the process-wide batcher classifying texts with ``model_name``.
+
+    The batch size and wait time only apply when the batcher is created.
+    """
+    with _batchers_lock:
+        batcher = _batchers.get(model_name)
+        if batcher is None:
+            batcher = _batchers[model_name] = MicroBatcher(
+                partial(routed_classify, model_name=model_name),
+                max_batch_size=max_batch_size, max_wait_ms=max_wait_ms,
+                name="micro-batcher-{}".format(model_name))
+        return batcher
+
+
+def batcher_stats():
+    """Return the statistics of every batcher created so far."""
+    with _batchers_lock:
+        batchers = dict(_batchers)
+    return {name: batcher.stats() for name, batcher in batchers.items()}
@@ -0,0 +1,239 @@
+"""
+    Process-wide registry for the TF-IDF vectorizer and classification models.
+
+    Description: Artifacts are unpickled the first time they are requested and
+    then kept in memory for the lifetime of the process, so every Streamlit
+    session (and any other entry point importing this module) shares a single
+    copy. A model is only loaded once it is actually selected.
+
+    Models are validated against their label schema (``<model>.labels.json``,
+    see label_schema.py) as part of every load, and again whenever the
+    manifest file itself changes.
+
+    Each lookup checks the artifact's file modification time. When it has
+    changed, the file is hashed and, if the contents differ, the artifact is
+    reloaded in place. A failed reload keeps serving the previous object.
+    Candidates loaded and warmed up in the background by model_versions.py
+    are swapped in with ``install``.
+
+"""
+import hashlib
+import io
+import os
+import threading
+import time
+
+import joblib
+
+from label_schema import LabelSchema, manifest_path
+from metrics import metrics
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+VECTORIZER_PATH = "tfidf_vectorizer.pkl"
+
+# Display name -> artifact file, in the order shown in the app
+MODEL_PATHS = {
+    "Logistic Regression": "mlr_model.pkl",
+    "Naive Bayes": "nb_model.pkl",
+    "Random Forest": "gbc_model.pkl",
+}
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class _Artifact:
+    """A loaded artifact together with the file state it was loaded from."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.obj = None
+        self.mtime = None
+        self.sha256 = None
+        self.load_seconds = 0.0
+        self.loads = 0
+        self.hits = 0
+        self.last_error = None
+        self.schema = None
+        self.schema_mtime = None
+
+
+class ModelRegistry:
+    """Lazily loads, shares and hot-reloads pickled artifacts."""
+
+    def __init__(self, base_dir=BASE_DIR, model_paths=None,
+                 vectorizer_path=VECTORIZER_PATH):
+        self.base_dir = base_dir
+        self.model_paths = dict(MODEL_PATHS if model_paths is None else model_paths)
+        self.vectorizer_path = vectorizer_path
+        self._artifacts = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, path):
+        """Return the absolute location of an artifact file."""
+        return path if os.path.isabs(path) else os.path.join(self.base_dir, path)
+
+    def _entry(self, path):
+        path = self.resolve(path)
+        with self._lock:
+            entry = self._artifacts.get(path)
+            if entry is None:
+                entry = self._artifacts[path] = _Artifact(path)
+            return entry
+
+    def _load(self, entry, mtime, sha256):
+        name = os.path.relpath(entry.path, self.base_dir)
+        start = time.perf_counter()
+        # Read and unpickle separately so disk I/O and deserialization are
+        # timed as their own stages
+        with metrics.timed("disk_read", name):
+            with open(entry.path, "rb") as f:
+                data = f.read()
+        with metrics.timed("unpickle", name):
+            obj = joblib.load(io.BytesIO(data))
+        if self._is_model(entry.path):
+            # Validate before replacing anything, so a model that does not
+            # match its manifest fails like any other reload
+            schema_mtime = _mtime(manifest_path(entry.path))
+            schema = LabelSchema.for_estimator(obj, entry.path)
+            entry.schema, entry.schema_mtime = schema, schema_mtime
+        entry.load_seconds = time.perf_counter() - start
+        entry.obj, entry.mtime, entry.sha256 = obj, mtime, sha256
+        entry.loads += 1
+        entry.last_error = None
+
+    def get(self, path):
+        """Return the artifact stored at ``path``, loading it if needed."""
+        entry = self._entry(path)
+        mtime = os.stat(entry.path).st_mtime_ns
+        if entry.obj is not None and entry.mtime == mtime:
+            entry.hits += 1
+            return entry.obj
+
+        with entry.lock:
+            # Another thread may have finished the load while we waited
+            if entry.obj is not None and entry.mtime == mtime:
+                entry.hits += 1
+                return entry.obj
+
+            sha256 = file_hash(entry.path)
+            if entry.obj is not None and entry.sha256 == sha256:
+                # Touched but unchanged, no need to unpickle again
+                entry.mtime = mtime
+                entry.hits += 1
+                return entry.obj
+
+            try:
+                self._load(entry, mtime, sha256)
+            except Exception as exc:
+                if entry.obj is None:
+                    raise
+                entry.last_error = repr(exc)
+            return entry.obj
+
+    def get_vectorizer(self):
+        """Return the fitted TF-IDF vectorizer."""
+        return self.get(self.vectorizer_path)
+
+    def get_model(self, name):
+        """Return the model registered under the display ``name``."""
+        try:
+            path = self.model_paths[name]
+        except KeyError:
+            raise KeyError("Unknown model: {}".format(name)) from None
+        model = self.get(path)
+        entry = self._entry(path)
+        schema_mtime = _mtime(manifest_path(entry.path))
+        if entry.schema_mtime != schema_mtime:
+            # The manifest was edited: re-validate the loaded model against it
+            with entry.lock:
+                if entry.schema_mtime != schema_mtime:
+                    try:
+                        entry.schema = LabelSchema.for_estimator(entry.obj, entry.path)
+                    except Exception as exc:
+                        if entry.schema is None:
+                            raise
+                        entry.last_error = repr(exc)
+                    entry.schema_mtime = schema_mtime
+        return model
+
+    def _is_model(self, path):
+        return path in {self.resolve(p) for p in self.model_paths.values()}
+
+    def install(self, name, obj, sha256, schema):
+        """Replace the named model with an already loaded and validated object.
+
+        Used to promote a warmed-up candidate (see model_versions.py). The
+        registered file's current mtime is kept, so the installed object is
+        served until that file itself changes.
+        """
+        entry = self._entry(self.model_paths[name])
+        mtime = os.stat(entry.path).st_mtime_ns
+        with entry.lock:
+            entry.schema, entry.schema_mtime = schema, _mtime(manifest_path(entry.path))
+            entry.obj, entry.mtime, entry.sha256 = obj, mtime, sha256
+            entry.last_error = None
+
+    def get_labels(self, name):
+        """Return the validated LabelSchema of the named model."""
+        self.get_model(name)
+        return self._entry(self.model_paths[name]).schema
+
+    def model_hash(self, name):
+        """Return the SHA-256 of the file the named model was loaded from."""
+        self.get_model(name)
+        return self._entry(self.model_paths[name]).sha256
+
+    def stats(self):
+        """Return hit/miss counts and load timings for every known artifact."""
+        with self._lock:
+            entries = list(self._artifacts.values())
+        artifacts = {}
+        for entry in entries:
+            artifacts[os.path.relpath(entry.path, self.base_dir)] = {
+                "loaded": entry.obj is not None,
+                "hits": entry.hits,
+                "loads": entry.loads,
+                "load_seconds": entry.load_seconds,
+                "sha256": entry.sha256,
+                "last_error": entry.last_error,
+            }
+        return {
+            "hits": sum(a["hits"] for a in artifacts.values()),
+            "misses": sum(a["loads"] for a in artifacts.values()),
+            "artifacts": artifacts,
+        }
+
+    def clear(self):
+        """Drop every loaded artifact, forcing a fresh load on next use."""
+        with self._lock:
+            self._artifacts.clear()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Return the registry shared by the whole process."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
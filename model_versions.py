@@ -0,0 +1,321 @@
+"""
+    Model versioning: background loading, hot swap and A/B routing.
+
+    Description: A retrained model is staged as a candidate next to the
+    model currently being served (the incumbent) without restarting the app:
+
+        1. ``stage`` unpickles the candidate file on a background thread,
+           validates it against its label manifest (or the incumbent's when
+           it has none) and warms it up by scoring a sample batch from
+           test.csv, recording how often it agrees with the incumbent.
+        2. ``set_share`` routes that fraction of classification calls to the
+           candidate. Each routed call is also scored by the incumbent on
+           the same TF-IDF rows so agreement keeps being measured on live
+           traffic.
+        3. ``promote`` swaps the candidate into the model registry in one
+           step; ``rollback`` swaps the previous model back in.
+
+    Plain classification, explanations (top-k and key terms), the input
+    guard's long-text path and CSV batch classification (one routing
+    decision per chunk) are all routed. The ensemble and the
+    cProfile option on the Home page always use the incumbents.
+
+    While a candidate is staged, the scoring time of every routed call is
+    recorded per version as the ``routed`` metrics stage, with the model
+    labelled ``<display name>@<first 12 hex digits of the file SHA-256>``.
+    The TF-IDF transform is shared by both versions and is not included.
+    The incumbent bypasses the prediction cache during that time, so both
+    versions are timed on rows they actually computed.
+
+    Usage:
+
+        versions = get_version_manager()
+        versions.stage("Logistic Regression", "mlr_model.v2.pkl", share=0.1)
+        ...
+        versions.promote("Logistic Regression")
+
+"""
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+import joblib
+import pandas as pd
+
+from inference import classify_matrix, explain_matrix, format_results, predict_proba, vectorize
+from label_schema import LabelSchema, manifest_path
+from metrics import metrics
+from model_registry import BASE_DIR, file_hash, get_registry
+from prediction_cache import cached_classify
+
+SAMPLE_PATH = os.path.join(BASE_DIR, "test.csv")
+SAMPLE_SIZE = 64
+TEXT_COLUMN = "content"
+
+
+def version_label(name, sha256):
+    """Return the ``name@version`` label used in metrics and stats."""
+    return "{}@{}".format(name, sha256[:12])
+
+
+class ModelVersion:
+    """One loaded version of a model and its traffic statistics."""
+
+    def __init__(self, name, path, model, schema, sha256):
+        self.name = name
+        self.path = path
+        self.model = model
+        self.schema = schema
+        self.sha256 = sha256
+        self.label = version_label(name, sha256)
+        self.loaded_at = time.time()
+        self.warmup = None
+        self.requests = 0
+        self.compared = 0
+        self.agreed = 0
+
+    def stats(self):
+        return {
+            "version": self.label,
+            "path": self.path,
+            "loaded_at": self.loaded_at,
+            "warmup": self.warmup,
+            "requests": self.requests,
+            "agreement": self.agreed / self.compared if self.compared else None,
+            "compared": self.compared,
+        }
+
+
+class VersionManager:
+    """Stages, routes to and promotes candidate versions of the models."""
+
+    def __init__(self, registry=None, sample_path=SAMPLE_PATH, sample_size=SAMPLE_SIZE):
+        self.registry = registry or get_registry()
+        self.sample_path = sample_path
+        self.sample_size = sample_size
+        self._candidates = {}
+        self._previous = {}
+        self._shares = {}
+        self._status = {}
+        self._served = {}
+        self._lock = threading.Lock()
+        self._loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-loader")
+
+    def stage(self, name, path, share=0.0):
+        """Load ``path`` as the candidate for ``name`` in the background.
+
+        Returns a Future that resolves to the ready ModelVersion, or raises
+        if loading, validation or the warm-up failed. The current candidate
+        keeps its place until the new one is ready.
+        """
+        if name not in self.registry.model_paths:
+            raise KeyError("Unknown model: {}".format(name))
+        path = self.registry.resolve(path)
+        with self._lock:
+            self._status[name] = {"state": "loading", "path": path, "error": None}
+        return self._loader.submit(self._stage, name, path, share)
+
+    def _stage(self, name, path, share):
+        try:
+            version = self._load(name, path)
+            self._warm_up(version)
+        except Exception as exc:
+            with self._lock:
+                self._status[name].update(state="failed", error=repr(exc))
+            raise
+        with self._lock:
+            self._candidates[name] = version
+            self._shares[name] = share
+            self._status[name].update(state="ready")
+        return version
+
+    def _load(self, name, path):
+        sha256 = file_hash(path)
+        with metrics.timed("unpickle", os.path.relpath(path, self.registry.base_dir)):
+            model = joblib.load(path)
+        # A retrained model without its own manifest shares the incumbent's
+        if not os.path.exists(manifest_path(path)):
+            schema_path = self.registry.resolve(self.registry.model_paths[name])
+        else:
+            schema_path = path
+        return ModelVersion(name, path, model, LabelSchema.for_estimator(model, schema_path), sha256)
+
+    def _warm_up(self, version):
+        """Score a sample batch so first requests do not pay for lazy setup."""
+        if not os.path.exists(self.sample_path):
+            version.warmup = {"rows": 0}
+            return
+        texts = pd.read_csv(self.sample_path, nrows=self.sample_size)[TEXT_COLUMN]
+        X = vectorize(self.registry.get_vectorizer(), texts.fillna("").astype(str).tolist())
+        start = time.perf_counter()
+        candidate = version.schema.labels[predict_proba(version.model, X).argmax(axis=1)]
+        seconds = time.perf_counter() - start
+        incumbent = [r["category"] for r in classify_matrix(X, version.name, self.registry)]
+        version.warmup = {
+            "rows": X.shape[0],
+            "seconds": seconds,
+            "agreement": float((candidate == incumbent).mean()) if X.shape[0] else None,
+        }
+
+    def set_share(self, name, share):
+        """Route the fraction ``share`` (0 to 1) of calls to the candidate."""
+        if not 0.0 <= share <= 1.0:
+            raise ValueError("share must be between 0 and 1")
+        with self._lock:
+            self._shares[name] = share
+
+    def promote(self, name):
+        """Swap the candidate in as the served model and stop routing."""
+        with self._lock:
+            version = self._candidates.pop(name, None)
+            if version is None:
+                raise KeyError("No candidate staged for {}".format(name))
+            self._previous[name] = self._incumbent(name)
+            self._shares.pop(name, None)
+            self._status[name] = {"state": "promoted", "path": version.path, "error": None}
+        self.registry.install(name, version.model, version.sha256, version.schema)
+        return version
+
+    def rollback(self, name):
+        """Swap back the model that was served before the last promotion."""
+        with self._lock:
+            version = self._previous.pop(name, None)
+            if version is None:
+                raise KeyError("Nothing to roll back for {}".format(name))
+            self._status[name] = {"state": "rolled back", "path": version.path, "error": None}
+        self.registry.install(name, version.model, version.sha256, version.schema)
+        return version
+
+    def discard(self, name):
+        """Drop the candidate for ``name``; all traffic goes to the incumbent."""
+        with self._lock:
+            self._candidates.pop(name, None)
+            self._shares.pop(name, None)
+            self._status.pop(name, None)
+
+    def _incumbent(self, name):
+        registry = self.registry
+        model = registry.get_model(name)
+        path = registry.resolve(registry.model_paths[name])
+        return ModelVersion(name, path, model, registry.get_labels(name), registry.model_hash(name))
+
+    def classify(self, texts, model_name):
+        """Classify ``texts`` with the incumbent, or the candidate for its share of calls."""
+        with self._lock:
+            staged = model_name in self._candidates
+        if not staged:
+            results = cached_classify(texts, model_name, self.registry)
+            self._count(version_label(model_name, self.registry.model_hash(model_name)), len(texts))
+            return results
+        X = vectorize(self.registry.get_vectorizer(), texts)
+        return self.score(X, model_name)[0]
+
+    def explain(self, texts, model_name, top_k=3, n_terms=10):
+        """Routed ``inference.explain``: returns ``(results, seconds)``."""
+        start = time.perf_counter()
+        X = vectorize(self.registry.get_vectorizer(), texts)
+        transform = time.perf_counter() - start
+        results, seconds = self.score(X, model_name, (top_k, n_terms))
+        return results, dict(seconds, transform=transform)
+
+    def score(self, X, model_name, details=None):
+        """Score vectorized rows with the version chosen for this call.
+
+        With ``details=(top_k, n_terms)`` the rows are explained as well
+        (see ``inference.explain_matrix``). Returns ``(results, seconds)``;
+        ``seconds`` is None without ``details``.
+        """
+        with self._lock:
+            candidate = self._candidates.get(model_name)
+            share = self._shares.get(model_name, 0.0)
+        version = candidate if candidate is not None and random.random() < share else None
+        if version is None:
+            label = version_label(model_name, self.registry.model_hash(model_name))
+            model = labels = None
+        else:
+            label, model, labels = version.label, version.model, version.schema.labels
+
+        # Only time the comparison while there is something to compare with
+        with metrics.timed("routed", label) if candidate is not None else nullcontext():
+            if details:
+                results, seconds = explain_matrix(X, model_name, *details, registry=self.registry,
+                                                  model=model, labels=labels)
+            elif version is None:
+                results, seconds = classify_matrix(X, model_name, self.registry), None
+            else:
+                results, seconds = format_results(predict_proba(model, X), labels), None
+
+        if version is None:
+            self._count(label, X.shape[0])
+            return results, seconds
+        # Shadow-score the incumbent on the same rows to measure agreement
+        incumbent = classify_matrix(X, model_name, self.registry)
+        agreed = sum(a["category"] == b["category"] for a, b in zip(results, incumbent))
+        with self._lock:
+            version.requests += X.shape[0]
+            version.compared += X.shape[0]
+            version.agreed += agreed
+        return results, seconds
+
+    def _count(self, label, rows):
+        with self._lock:
+            self._served[label] = self._served.get(label, 0) + rows
+
+    def stats(self):
+        """Return the serving state and traffic statistics of every model."""
+        latency = {row["model"]: row for row in metrics.summary() if row["stage"] == "routed"}
+
+        def with_latency(entry):
+            row = latency.get(entry["version"], {})
+            entry.update({key: row.get(key) for key in ("mean_ms", "p95_ms")})
+            return entry
+
+        # Only report on loaded models; asking for a hash would load the rest
+        artifacts = self.registry.stats()["artifacts"]
+        stats = {}
+        with self._lock:
+            for name, path in self.registry.model_paths.items():
+                sha256 = artifacts.get(path, {}).get("sha256")
+                candidate = self._candidates.get(name)
+                incumbent = {"version": version_label(name, sha256) if sha256 else None}
+                incumbent["requests"] = self._served.get(incumbent["version"], 0)
+                stats[name] = {
+                    "incumbent": with_latency(incumbent),
+                    "candidate": with_latency(candidate.stats()) if candidate else None,
+                    "share": self._shares.get(name, 0.0),
+                    "status": dict(self._status[name]) if name in self._status else None,
+                    "can_roll_back": name in self._previous,
+                }
+        return stats
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_version_manager():
+    """Return the version manager shared by the whole process."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = VersionManager()
+    return _manager
+
+
+def routed_classify(texts, model_name):
+    """Classify through the shared version manager (see ``VersionManager.classify``)."""
+    return get_version_manager().classify(texts, model_name)
+
+
+def routed_explain(texts, model_name, top_k=3, n_terms=10):
+    """Explain through the shared version manager (see ``VersionManager.explain``)."""
+    return get_version_manager().explain(texts, model_name, top_k, n_terms)
+
+
+def routed_score(X, model_name, details=None):
+    """Score rows through the shared version manager (see ``VersionManager.score``)."""
+    return get_version_manager().score(X, model_name, details)
@@ -0,0 +1,196 @@
+"""
+    Multi-process batch scoring for large CSV or JSONL archives.
+
+    Description: The input is split into shards of ``--shard-size`` rows
+    that a pool of worker processes vectorizes and predicts in parallel.
+    Results are written in input order and only a bounded number of shards
+    is in flight at any time, so memory stays flat for any input size.
+
+    Model memory is shared rather than copied per worker:
+
+      * with the "fork" start method (the default on Linux) the parent loads
+        the artifacts once and workers inherit them copy-on-write;
+      * with --mmap, workers instead open the joblib artifacts with
+        ``mmap_mode="r"`` so their NumPy arrays are mapped from the page
+        cache shared by every process.
+
+    Usage:
+
+        python parallel_score.py archive.csv -o scored.csv --workers 8
+        python parallel_score.py archive.jsonl -o scored.jsonl --mmap
+
+"""
+import argparse
+import collections
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import joblib
+import pandas as pd
+
+from inference import predict, vectorize
+from label_schema import LabelSchema
+from model_registry import MODEL_PATHS, get_registry
+
+TEXT_FIELD = "content"
+PREDICTION_FIELD = "predicted_category"
+ERROR_FIELD = "_error"
+DEFAULT_SHARD_SIZE = 2000
+
+# Per-process state set up by _init_worker
+_worker = {}
+
+
+def _init_worker(model_name, use_mmap):
+    registry = get_registry()
+    if use_mmap:
+        vectorizer_path = registry.resolve(registry.vectorizer_path)
+        model_path = registry.resolve(registry.model_paths[model_name])
+        model = joblib.load(model_path, mmap_mode="r")
+        _worker["vectorizer"] = joblib.load(vectorizer_path, mmap_mode="r")
+        _worker["model"] = model
+        _worker["schema"] = LabelSchema.for_estimator(model, model_path)
+    else:
+        # Already loaded by the parent before forking, so this is free
+        _worker["vectorizer"] = registry.get_vectorizer()
+        _worker["model"] = registry.get_model(model_name)
+        _worker["schema"] = registry.get_labels(model_name)
+
+
+def _score_shard(texts):
+    if not texts:
+        return []
+    X = vectorize(_worker["vectorizer"], texts)
+    return _worker["schema"].decode(predict(_worker["model"], X)).tolist()
+
+
+def input_format(path, fmt=None):
+    """Return "csv" or "jsonl" for ``path``."""
+    if fmt:
+        return fmt
+    return "jsonl" if path.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+def _parse_line(line):
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def iter_shards(path, fmt, shard_size, text_field=TEXT_FIELD):
+    """Yield ``(rows, texts)`` pairs of at most ``shard_size`` records.
+
+    In JSONL input, lines that are not JSON objects are kept as ``None``
+    rows without a text, so they can be reported in place.
+    """
+    if fmt == "csv":
+        with pd.read_csv(path, chunksize=shard_size) as reader:
+            for chunk in reader:
+                if text_field not in chunk.columns:
+                    raise ValueError("Input has no '{}' column".format(text_field))
+                yield chunk, chunk[text_field].fillna("").astype(str).tolist()
+        return
+
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            rows.append(_parse_line(line))
+            if len(rows) == shard_size:
+                yield rows, _texts(rows, text_field)
+                rows = []
+    if rows:
+        yield rows, _texts(rows, text_field)
+
+
+def _texts(rows, text_field):
+    return [str(row.get(text_field) or "") for row in rows if row is not None]
+
+
+def _write_shard(out, fmt, rows, labels, first):
+    if fmt == "csv":
+        rows = rows.assign(**{PREDICTION_FIELD: labels})
+        rows.to_csv(out, header=first, index=False)
+    else:
+        labels = iter(labels)
+        for row in rows:
+            if row is None:
+                row = {ERROR_FIELD: "invalid JSON object"}
+            else:
+                row[PREDICTION_FIELD] = next(labels)
+            out.write(json.dumps(row) + "\n")
+
+
+def score_file(path, out, model_name, workers=None, shard_size=DEFAULT_SHARD_SIZE,
+               fmt=None, text_field=TEXT_FIELD, use_mmap=False, progress=None):
+    """Score ``path`` with a process pool, writing results to ``out`` in order.
+
+    Returns the number of records written, JSONL error records included.
+    """
+    fmt = input_format(path, fmt)
+    workers = workers or os.cpu_count() or 1
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+    if context.get_start_method() == "fork" and not use_mmap:
+        # Load once in the parent; forked workers share these pages
+        _init_worker(model_name, use_mmap=False)
+    elif context.get_start_method() != "fork":
+        use_mmap = True
+
+    # Enough shards in flight to keep every worker busy, but no more
+    max_pending = workers * 2
+    pending = collections.deque()
+    records = 0
+    with context.Pool(workers, initializer=_init_worker, initargs=(model_name, use_mmap)) as pool:
+        def drain(limit):
+            nonlocal records
+            while len(pending) > limit:
+                rows, result = pending.popleft()
+                labels = result.get()
+                _write_shard(out, fmt, rows, labels, first=(records == 0))
+                records += len(rows)
+                if progress is not None:
+                    progress(records)
+
+        for rows, texts in iter_shards(path, fmt, shard_size, text_field):
+            pending.append((rows, pool.apply_async(_score_shard, (texts,))))
+            drain(max_pending)
+        drain(0)
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a large CSV/JSONL file with a process pool.")
+    parser.add_argument("input", help="CSV or JSONL file")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    parser.add_argument("-m", "--model", default="Logistic Regression", choices=list(MODEL_PATHS))
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="input format (default: from extension)")
+    parser.add_argument("--text-field", default=TEXT_FIELD)
+    parser.add_argument("--mmap", action="store_true",
+                        help="memory-map artifacts in each worker instead of relying on fork")
+    args = parser.parse_args(argv)
+
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    start = time.perf_counter()
+    try:
+        records = score_file(args.input, out, args.model, workers=args.workers,
+                             shard_size=args.shard_size, fmt=args.format,
+                             text_field=args.text_field, use_mmap=args.mmap)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    print("Scored {} records in {:.2f} s ({:.0f} records/s) with {} workers".format(
+        records, elapsed, records / elapsed if elapsed else 0.0, args.workers), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
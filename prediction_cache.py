@@ -0,0 +1,276 @@
+"""
+    Prediction cache keyed by model, model file hash and normalized text.
+
+    Description: Duplicate wire stories are classified without running the
+    TF-IDF transform or the model again. An in-process LRU/FIFO tier with a
+    TTL sits in front of an optional on-disk SQLite tier that survives
+    restarts and is shared by every process using the same directory.
+
+    Configuration (environment variables):
+
+        CLASSIFIER_CACHE_SIZE    max in-process entries (default 10000, 0 disables)
+        CLASSIFIER_CACHE_TTL     entry lifetime in seconds (default 3600, 0 = forever)
+        CLASSIFIER_CACHE_POLICY  in-process eviction policy, "lru" or "fifo"
+        CLASSIFIER_CACHE_DIR     directory for the on-disk tier (unset disables it)
+        CLASSIFIER_CACHE_DISK_SIZE  max on-disk entries (default 1000000)
+
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from inference import classify
+from model_registry import get_registry
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """Normalize ``text`` without changing what the vectorizer sees.
+
+    The vectorizer lowercases its input and only looks at word tokens, so
+    case and runs of whitespace do not affect the prediction.
+    """
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def cache_key(model_name, model_hash, text, labels_digest=""):
+    """Return the cache key for ``text`` classified by a given model file."""
+    text_hash = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return "{}:{}:{}:{}".format(model_name, model_hash, labels_digest, text_hash)
+
+
+class MemoryCache:
+    """Thread-safe in-process cache with LRU or FIFO eviction and a TTL."""
+
+    def __init__(self, max_entries=10000, ttl=3600.0, policy="lru"):
+        if policy not in ("lru", "fifo"):
+            raise ValueError("Unknown eviction policy: {}".format(policy))
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.policy = policy
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            value, expires = item
+            if expires and expires < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            if self.policy == "lru":
+                self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "policy": self.policy,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class DiskCache:
+    """SQLite-backed cache tier; values are stored as JSON.
+
+    Expired rows are deleted and the size cap enforced every
+    ``prune_every`` inserts (and on open) rather than on each one, so the
+    table may briefly exceed ``max_entries`` by that many rows per process.
+    """
+
+    def __init__(self, directory, max_entries=1000000, ttl=3600.0, prune_every=1000):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "predictions.sqlite3")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.prune_every = prune_every
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)")
+        # Expiry and oldest-first eviction both scan by creation time
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS predictions_created ON predictions (created)")
+        with self._lock:
+            self._prune()
+        self._conn.commit()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM predictions WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.ttl and row[1] + self.ttl < time.time()):
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO predictions (key, value, created) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time()))
+            self._puts += 1
+            if self._puts % self.prune_every == 0:
+                self._prune()
+            self._conn.commit()
+
+    def _prune(self):
+        # Called with the lock held
+        if self.ttl:
+            self._conn.execute("DELETE FROM predictions WHERE created < ?", (time.time() - self.ttl,))
+        count = self._conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        if count > self.max_entries:
+            # Drop the oldest entries first
+            self._conn.execute(
+                "DELETE FROM predictions WHERE key IN ("
+                "SELECT key FROM predictions ORDER BY created LIMIT ?)",
+                (count - self.max_entries,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM predictions")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class PredictionCache:
+    """In-process tier in front of an optional on-disk tier."""
+
+    def __init__(self, memory=None, disk=None):
+        self.memory = memory if memory is not None else MemoryCache()
+        self.disk = disk
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.put(key, value)
+        return value
+
+    def put(self, key, value):
+        self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(key, value)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        return {
+            "memory": self.memory.stats(),
+            "disk": self.disk.stats() if self.disk is not None else None,
+        }
+
+
+def cache_from_env(environ=os.environ):
+    """Build a PredictionCache from the CLASSIFIER_CACHE_* variables."""
+    ttl = float(environ.get("CLASSIFIER_CACHE_TTL", 3600))
+    memory = MemoryCache(
+        max_entries=int(environ.get("CLASSIFIER_CACHE_SIZE", 10000)),
+        ttl=ttl,
+        policy=environ.get("CLASSIFIER_CACHE_POLICY", "lru").lower())
+    disk = None
+    if environ.get("CLASSIFIER_CACHE_DIR"):
+        disk = DiskCache(environ["CLASSIFIER_CACHE_DIR"],
+                         max_entries=int(environ.get("CLASSIFIER_CACHE_DISK_SIZE", 1000000)),
+                         ttl=ttl)
+    return PredictionCache(memory, disk)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the prediction cache shared by the whole process."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = cache_from_env()
+    return _cache
+
+
+def cached_classify(texts, model_name, registry=None, cache=None):
+    """Like ``inference.classify`` but only computes texts not in the cache.
+
+    All misses are vectorized and predicted together in one batch.
+    """
+    registry = registry or get_registry()
+    cache = cache or get_cache()
+    model_hash = registry.model_hash(model_name)
+    # A changed label manifest must not serve results decoded with the old one
+    labels_digest = registry.get_labels(model_name).digest
+    keys = [cache_key(model_name, model_hash, text, labels_digest) for text in texts]
+    results = [cache.get(key) for key in keys]
+
+    # Duplicates within the batch are only computed once
+    missing = {}
+    for i, result in enumerate(results):
+        if result is None:
+            missing.setdefault(keys[i], []).append(i)
+    if missing:
+        first = [positions[0] for positions in missing.values()]
+        computed = classify([texts[i] for i in first], model_name, registry)
+        for (key, positions), result in zip(missing.items(), computed):
+            cache.put(key, result)
+            for i in positions:
+                results[i] = result
+    return results
@@ -0,0 +1,63 @@
+"""Parity of the NumPy scoring engine with the fitted scikit-learn estimators."""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from linear_scoring import LinearScorer
+from model_registry import BASE_DIR, MODEL_PATHS, get_registry
+
+LINEAR_MODELS = [
+    name for name in MODEL_PATHS
+    if LinearScorer.supports(get_registry().get_model(name))
+]
+
+
+@pytest.fixture(scope="module")
+def features():
+    texts = pd.read_csv(os.path.join(BASE_DIR, "test.csv"))["content"].fillna("").astype(str)
+    return get_registry().get_vectorizer().transform(texts.tolist()).tocsr()
+
+
+@pytest.mark.parametrize("name", LINEAR_MODELS)
+def test_predict_matches_estimator(name, features):
+    estimator = get_registry().get_model(name)
+    scorer = LinearScorer.from_estimator(estimator)
+    np.testing.assert_array_equal(scorer.predict(features), estimator.predict(features))
+
+
+@pytest.mark.parametrize("name", LINEAR_MODELS)
+def test_predict_proba_matches_estimator(name, features):
+    estimator = get_registry().get_model(name)
+    scorer = LinearScorer.from_estimator(estimator)
+    np.testing.assert_allclose(scorer.predict_proba(features), estimator.predict_proba(features),
+                               rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize("name", LINEAR_MODELS)
+def test_single_row_and_dense_input(name, features):
+    estimator = get_registry().get_model(name)
+    scorer = LinearScorer.from_estimator(estimator)
+    row = features[:1]
+    np.testing.assert_allclose(scorer.predict_proba(row), estimator.predict_proba(row), atol=1e-9)
+    np.testing.assert_allclose(scorer.predict_proba(row.toarray()), estimator.predict_proba(row),
+                               atol=1e-9)
+
+
+@pytest.mark.parametrize("multi_class", ["auto", "deprecated"])
+def test_liblinear_default_is_one_vs_rest(multi_class, features):
+    # scikit-learn 1.5+ stores multi_class="deprecated" by default
+    labels = get_registry().get_model("Logistic Regression").predict(features)
+    estimator = LogisticRegression(solver="liblinear").fit(features, labels)
+    expected = estimator.predict_proba(features)
+    estimator.multi_class = multi_class
+    scorer = LinearScorer.from_estimator(estimator)
+    assert scorer.multi_class == "ovr"
+    np.testing.assert_allclose(scorer.predict_proba(features), expected, rtol=0, atol=1e-9)
+
+
+def test_unsupported_estimator_is_rejected():
+    with pytest.raises(TypeError):
+        LinearScorer.from_estimator(get_registry().get_model("Random Forest"))